@@ -0,0 +1,175 @@
+"""
+Local stand-in for the OpenAI HTTP API, for benchmarks.
+
+Serves POST /v1/chat/completions (plain and streamed) and POST
+/v1/embeddings with simulated latency and canned JSON, so the service can
+be load-tested without cost or network variance. Point the service at it
+with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Latency is sampled per request from a distribution ("fixed", "uniform"
+between median*(1-spread) and median*(1+spread), or "lognormal" with sigma
+= spread). Streams deliver the first chunk after the sampled latency and
+the rest at STREAM_CHUNK_DELAY intervals. Configured through environment
+variables so it can run under uvicorn:
+
+  FAKE_CHAT_LATENCY=0.8 FAKE_EMBED_LATENCY=0.05 FAKE_LATENCY_DIST=lognormal \\
+  FAKE_LATENCY_SPREAD=0.3 FAKE_ERROR_RATE=0 FAKE_CANNED=canned.json \\
+  python -m uvicorn app.benchmarks.fake_openai:app --port 8900
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import time
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CHAT_LATENCY = float(os.getenv("FAKE_CHAT_LATENCY", "0.8"))
+EMBED_LATENCY = float(os.getenv("FAKE_EMBED_LATENCY", "0.05"))
+LATENCY_DIST = os.getenv("FAKE_LATENCY_DIST", "lognormal")
+LATENCY_SPREAD = float(os.getenv("FAKE_LATENCY_SPREAD", "0.3"))
+# Fraction of requests answered with 429 or 500, to exercise retries
+ERROR_RATE = float(os.getenv("FAKE_ERROR_RATE", "0"))
+# JSON file {"plan": ..., "overview": ...} replacing the built-in answers
+CANNED_FILE = os.getenv("FAKE_CANNED", "")
+EMBED_DIM = int(os.getenv("FAKE_EMBED_DIM", "1536"))
+STREAM_CHUNK_CHARS = 24
+STREAM_CHUNK_DELAY = 0.005
+
+_PLAN_DAY = {
+    "overview": "Notice where the old wound speaks loudest today.",
+    "activity": "Write down three moments you felt unseen and what you needed.",
+    "prompts": ["What did I need in that moment?", "Who taught me to hide it?"],
+    "meditation": "Ten minutes of breath awareness, hand on the heart.",
+    "affirmation": "My sensitivity is a source of wisdom.",
+}
+
+CANNED = {
+    "plan": {"plan": [_PLAN_DAY] * 7},
+    "overview": {
+        "description": "Chiron here points to a wound around self-worth that becomes a gift for others.",
+        "coreWoundsAndEmotionalThemes": ["self-worth", "belonging"],
+        "patternsAndStruggles": ["people pleasing", "over-giving"],
+        "healingAndTransformation": ["healthy boundaries", "self-acceptance"],
+        "spiritualWisdomAndGifts": ["empathy", "mentoring"],
+        "woundPoints": ["Feeling invisible in close relationships."],
+        "patternsConnectedToThisWound": ["Saying yes when you mean no."],
+        "healingBenefits": ["Relationships based on mutual respect."],
+        "reflectiveQuestions": ["Where do I abandon myself to be accepted?"],
+    },
+}
+if CANNED_FILE:
+    with open(CANNED_FILE) as f:
+        CANNED.update(json.load(f))
+
+app = FastAPI(title="Fake OpenAI")
+
+
+def sample_latency(median: float) -> float:
+    if median <= 0:
+        return 0.0
+    if LATENCY_DIST == "fixed":
+        return median
+    if LATENCY_DIST == "uniform":
+        return random.uniform(median * (1 - LATENCY_SPREAD), median * (1 + LATENCY_SPREAD))
+    return random.lognormvariate(np.log(median), LATENCY_SPREAD)
+
+
+def _injected_error():
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        status = random.choice((429, 500))
+        return JSONResponse({"error": {"message": "injected failure", "type": "fake"}}, status_code=status)
+    return None
+
+
+def _translation(prompt: str) -> str:
+    """Echo a translation request's values, tagged with the target language."""
+    language = prompt.split("Target language:", 1)[1].split("\n", 1)[0].strip()
+    values = json.loads(prompt.split("JSON:", 1)[1])
+    return json.dumps({key: f"[{language}] {text}" for key, text in values.items()}, ensure_ascii=False)
+
+
+def _canned_answer(body: dict) -> str:
+    """Plan or overview JSON, chosen by the requested schema or the prompt text."""
+    fmt = body.get("response_format") or {}
+    name = (fmt.get("json_schema") or {}).get("name", "")
+    prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+    if "Target language:" in prompt:
+        return _translation(prompt)
+    kind = "plan" if name.startswith("Plan") or "day-by-day" in prompt else "overview"
+    answer = CANNED[kind]
+    if kind == "plan" and not fmt and isinstance(answer, dict):
+        answer = answer["plan"]
+    return json.dumps(answer)
+
+
+def _usage(prompt: str, completion: str) -> dict:
+    prompt_tokens, completion_tokens = len(prompt) // 4, len(completion) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0}}
+
+
+def _embedding(text: str) -> np.ndarray:
+    """Deterministic unit vector per text, so repeated queries rank the same."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(EMBED_DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    await asyncio.sleep(sample_latency(EMBED_LATENCY))
+    error = _injected_error()
+    if error:
+        return error
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    data = []
+    for i, text in enumerate(inputs):
+        vector = _embedding(str(text))
+        if body.get("encoding_format") == "base64":
+            embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+        else:
+            embedding = vector.tolist()
+        data.append({"object": "embedding", "index": i, "embedding": embedding})
+    tokens = sum(len(str(text)) // 4 for text in inputs)
+    return {"object": "list", "data": data, "model": body.get("model"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(sample_latency(CHAT_LATENCY))
+    error = _injected_error()
+    if error:
+        return error
+
+    content = _canned_answer(body)
+    prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+    base = {"id": f"chatcmpl-fake{time.time_ns()}", "created": int(time.time()), "model": body.get("model")}
+    if not body.get("stream"):
+        return dict(base, object="chat.completion", usage=_usage(prompt, content), choices=[
+            {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+        ])
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+    async def events():
+        chunk = dict(base, object="chat.completion.chunk")
+        for start in range(0, len(content), STREAM_CHUNK_CHARS):
+            if start:
+                await asyncio.sleep(STREAM_CHUNK_DELAY)
+            delta = {"content": content[start:start + STREAM_CHUNK_CHARS]}
+            yield f"data: {json.dumps(dict(chunk, choices=[{'index': 0, 'delta': delta, 'finish_reason': None}]))}\n\n"
+        yield f"data: {json.dumps(dict(chunk, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))}\n\n"
+        if include_usage:
+            yield f"data: {json.dumps(dict(chunk, choices=[], usage=_usage(prompt, content)))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
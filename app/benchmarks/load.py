@@ -0,0 +1,171 @@
+"""
+Fixed-concurrency load test of the HTTP API.
+
+Each level keeps `concurrency` requests in flight until `requests` have
+completed, then reports p50/p95/p99 latency, requests per second and
+errors. Payloads cycle through every sign x house (and a set of birth
+places for the end-user route) so responses are not all served by one
+cache entry.
+
+With no target URL, run_suite() starts the fake OpenAI server and the
+service itself as uvicorn subprocesses. The service gets scratch query and
+translation caches, no LLM response cache and no precomputed store, so
+every request exercises retrieval, prompt building and an LLM round trip.
+"""
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import httpx
+import numpy as np
+
+from app.services.chiron_table import SIGNS
+from app.services.sign_house_convector import ordinal
+
+BIRTH_PLACES = ["Berlin, Germany", "London, UK", "Tokyo, Japan", "Yangon, Myanmar",
+                "New York, USA", "Sydney, Australia", "Paris, France", "Lagos, Nigeria"]
+
+
+def _placement_payloads():
+    return ({"sign": sign, "house": ordinal(house), "question": "", "language": "English"}
+            for sign, house in itertools.product(SIGNS, range(1, 13)))
+
+
+def _end_user_payloads():
+    return ({"birthDate": f"19{60 + i % 40}-{1 + i % 12:02d}-{1 + i % 28:02d}", "birthTime": f"{i % 24:02d}:30",
+             "birthPlace": place, "language": "English"}
+            for i, place in enumerate(BIRTH_PLACES * 18))
+
+
+ENDPOINTS = {
+    "generate_plan": ("/healing/generate_plan", _placement_payloads),
+    "generate_overview": ("/healing/generate_overview", _placement_payloads),
+    "generate_overview_end_user": ("/healing/generate_overview_end_user", _end_user_payloads),
+}
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    ms = 1000 * np.asarray(latencies) if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+    }
+
+
+async def run_level(base_url: str, endpoint: str, concurrency: int, requests: int, timeout: float = 120) -> dict:
+    """Drive one endpoint with `concurrency` workers until `requests` complete."""
+    path, payloads = ENDPOINTS[endpoint]
+    queue = itertools.islice(itertools.cycle(list(payloads())), requests)
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def worker():
+            nonlocal errors
+            for payload in queue:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(path, json=payload)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, errors, elapsed)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not start within {timeout}s")
+
+
+def _uvicorn(target: str, port: int, env: dict, workers: int = 1) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", target, "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+
+
+@contextmanager
+def local_servers(fake_env: dict = None, service_env: dict = None, workers: int = 1):
+    """Start the fake OpenAI server and the service; yields the service URL."""
+    fake_port, service_port = _free_port(), _free_port()
+    scratch = tempfile.mkdtemp(prefix="bench-")
+    env = dict(
+        os.environ,
+        OPENAI_BASE_URL=f"http://127.0.0.1:{fake_port}/v1",
+        OPENAI_API_KEY="benchmark",
+        QUERY_CACHE_FILE=os.path.join(scratch, "query_cache.sqlite"),
+        TRANSLATION_CACHE_FILE=os.path.join(scratch, "translations.sqlite"),
+        LLM_CACHE_SIZE="0",
+        LLM_CACHE_FILE="",
+        SERVE_FROM_STORE="false",
+        LOG_LEVEL="WARNING",
+    )
+    env.update(service_env or {})
+    processes = []
+    try:
+        processes.append(_uvicorn("app.benchmarks.fake_openai:app", fake_port, dict(os.environ, **(fake_env or {}))))
+        processes.append(_uvicorn("app.main:app", service_port, env, workers))
+        _wait_ready(f"http://127.0.0.1:{fake_port}/docs", processes[0])
+        _wait_ready(f"http://127.0.0.1:{service_port}/metrics", processes[1])
+        yield f"http://127.0.0.1:{service_port}"
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+
+
+async def run_levels(base_url: str, endpoints: list[str], levels: list[int], requests: int) -> dict:
+    results = {}
+    for endpoint in endpoints:
+        # One untimed request per endpoint loads lazy state (store, matchers).
+        await run_level(base_url, endpoint, 1, 1)
+        for concurrency in levels:
+            results[f"{endpoint}@{concurrency}"] = await run_level(base_url, endpoint, concurrency, requests)
+    return results
+
+
+def run_suite(endpoints: list[str] = None, levels: list[int] = (1, 8, 32), requests: int = 200,
+              url: str = None, fake_env: dict = None, workers: int = 1) -> dict:
+    """
+    Load-test endpoints at each concurrency level, against url or local
+    servers. Returns {"<endpoint>@<concurrency>": stats}.
+    """
+    endpoints = endpoints or list(ENDPOINTS)
+    if url:
+        return asyncio.run(run_levels(url, endpoints, list(levels), requests))
+    with local_servers(fake_env, workers=workers) as base_url:
+        return asyncio.run(run_levels(base_url, endpoints, list(levels), requests))
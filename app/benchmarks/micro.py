@@ -0,0 +1,142 @@
+"""
+Microbenchmarks of the hot functions on the request path.
+
+Every benchmark returns per-call statistics in microseconds. Nothing here
+calls OpenAI: search_index is measured with its query embedding already in
+a scratch query cache, so it times the cache lookup and the FAISS search.
+"""
+import asyncio
+import json
+import tempfile
+import time
+
+import numpy as np
+
+PLACES = [("Germany", "Berlin"), ("UK", "London"), ("Japan", "Tokyo"), ("Myanmar", "Yangon"),
+          ("USA", "New York"), ("Australia", "Sydney"), ("France", "Paris"), ("Nigeria", "Lagos"),
+          ("Germny", "Munchen"), ("", "Tokio")]  # misspelled: fuzzy path
+
+
+def summarize(times: list[float]) -> dict:
+    us = np.asarray(times) * 1e6
+    return {
+        "calls": len(times),
+        "mean_us": float(us.mean()),
+        "p50_us": float(np.percentile(us, 50)),
+        "p95_us": float(np.percentile(us, 95)),
+        "min_us": float(us.min()),
+    }
+
+
+def measure(fn, repeat: int = 200, setup=None) -> dict:
+    """Call fn() `repeat` times (after setup(), if given, each time) and summarize."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def bench_location(repeat: int) -> dict:
+    from app.services.location_convector import get_lat_lon_timezone
+
+    places = iter(PLACES * repeat)
+    start = time.perf_counter()
+    get_lat_lon_timezone(*PLACES[0])
+    first = time.perf_counter() - start
+
+    cold = measure(lambda: get_lat_lon_timezone(*next(places)), repeat, setup=get_lat_lon_timezone.cache_clear)
+    warm = measure(lambda: get_lat_lon_timezone(*next(places)), repeat)
+    return {
+        # process cold: loads geonames and builds the matchers
+        "get_lat_lon_timezone.first_call": {"calls": 1, "mean_us": first * 1e6},
+        "get_lat_lon_timezone.cold": cold,
+        "get_lat_lon_timezone.warm": warm,
+    }
+
+
+def bench_chiron(repeat: int) -> dict:
+    from app.services.sign_house_convector import calculate_chiron_position
+
+    years = iter(range(repeat * 2))
+
+    def call():
+        year = 1940 + next(years) % 80
+        calculate_chiron_position(f"{year}-06-15", "12:30", "+01:00", 52.52, 13.40)
+
+    call()
+    return {"calculate_chiron_position": measure(call, repeat)}
+
+
+def bench_chunk_text(repeat: int, pdf_path: str) -> dict:
+    from app.services.pdf_service import chunk_text, extract_text_from_pdf
+
+    text = extract_text_from_pdf(pdf_path)
+    result = measure(lambda: chunk_text(text), repeat)
+    result["words"] = len(text.split())
+    return {"chunk_text": result}
+
+
+def bench_search_index(repeat: int) -> dict:
+    from app.services import embedding_service
+    from app.services.query_cache import QueryEmbeddingCache
+    from app.services.retrieval_store import get_snapshot
+
+    store = get_snapshot()
+    original = embedding_service.query_cache
+    with tempfile.TemporaryDirectory() as scratch:
+        embedding_service.query_cache = QueryEmbeddingCache(f"{scratch}/query_cache.sqlite")
+        try:
+            query = "Chiron in Aries"
+            vector = np.asarray(store.embeddings[0], dtype=np.float32)
+            embedding_service.query_cache.put(embedding_service.EMBED_MODEL, query, vector)
+
+            async def run():
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    await embedding_service.search_index(store.index, query, top_k=5)
+                    timings.append(time.perf_counter() - start)
+                return timings
+
+            timings = asyncio.run(run())
+        finally:
+            embedding_service.query_cache = original
+    result = summarize(timings)
+    result.update(chunks=len(store.chunks), index=store.manifest.get("index", {}).get("type"))
+    return {"search_index": result}
+
+
+def bench_clean_json(repeat: int) -> dict:
+    from app.benchmarks.fake_openai import CANNED
+    from app.services.llm_service import clean_json_response
+
+    plan = json.dumps(CANNED["plan"]["plan"], indent=2)
+    wrapped = f"Here is your plan:\n```json\n{plan}\n```\nLet me know if you need more."
+    return {
+        "clean_json_response.plain": measure(lambda: clean_json_response(plan), repeat),
+        "clean_json_response.wrapped": measure(lambda: clean_json_response(wrapped), repeat),
+    }
+
+
+def run_suite(repeat: int = 200, pdf_path: str = None) -> dict:
+    """Run every microbenchmark; returns {name: stats}."""
+    from app.services.retrieval_store import PDF_PATH
+
+    results = {}
+    results.update(bench_location(repeat))
+    results.update(bench_chiron(repeat))
+    results.update(bench_chunk_text(max(1, repeat // 10), pdf_path or PDF_PATH))
+    results.update(bench_search_index(repeat))
+    results.update(bench_clean_json(repeat))
+    return results
+
+
+def compare(current: dict, baseline: dict, key: str) -> dict:
+    """current / baseline ratio of `key` for every benchmark present in both."""
+    return {name: current[name][key] / baseline[name][key]
+            for name in current
+            if key in current[name] and key in baseline.get(name, {}) and baseline[name][key]}
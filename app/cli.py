@@ -0,0 +1,238 @@
+import argparse
+import asyncio
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def warm_embeddings(args):
+    from app.services.embedding_service import warm_query_cache
+    from app.services.query_templates import all_queries
+
+    queries = all_queries()
+    embedded = warm_query_cache(queries)
+    print(f"Query cache warm: {len(queries)} queries, {embedded} newly embedded")
+
+
+def precompute(args):
+    from app.services.generation_store import precompute as run_precompute, store_version
+    from app.services.translation_service import CANONICAL_LANGUAGE
+
+    counts = asyncio.run(run_precompute(
+        languages=args.language or [CANONICAL_LANGUAGE],
+        kinds=args.kind or ("overview", "plan"),
+        max_workers=args.workers,
+        force=args.force,
+    ))
+    print(f"Generation store {store_version()}: {counts}")
+
+
+def build_chiron_table(args):
+    from app.services import chiron_table
+    from app.services.ephemeris import EPHE_PATH
+
+    meta = chiron_table.build_table(EPHE_PATH, args.start_year, args.end_year)
+    print(f"Chiron table written to {chiron_table.TABLE_FILE}: "
+          f"{meta['count']} samples, max error {meta['max_error_deg']:.6f}°")
+
+
+def import_gazetteer(args):
+    from app.services.gazetteer import GAZETTEER_FILE, import_geonames
+
+    counts = import_geonames(args.dump, args.output, args.min_population)
+    print(f"Gazetteer written to {args.output or GAZETTEER_FILE}: {counts['places']} places, "
+          f"{counts['names']} names, {counts['bytes'] / 1e6:.1f} MB")
+
+
+def startup_report(args):
+    from app.startup import import_timings, warm_up, format_report
+
+    print(format_report("Import cost:", import_timings()))
+    print(format_report("Init cost:", warm_up()))
+
+
+def migrate_store(args):
+    from app.services.retrieval_store import migrate_pickle_store
+
+    version = migrate_pickle_store(args.embeddings, args.index)
+    print(f"Vector store version {version} written and made current")
+
+
+def ingest(args):
+    from app.services.ingest_service import ingest as run_ingest
+    from app.services.pdf_service import find_documents
+    from app.services.retrieval_store import DOCUMENT_PATHS, CHUNK_OVERLAP, CHUNK_METHOD
+
+    result = run_ingest(
+        find_documents(args.pdf or DOCUMENT_PATHS),
+        max_len=args.max_len,
+        overlap=CHUNK_OVERLAP if args.overlap is None else args.overlap,
+        force=args.force,
+        workers=args.workers,
+        method=args.chunking or CHUNK_METHOD,
+        index_type=args.index_type,
+    )
+    if result["unchanged"]:
+        print(f"Source unchanged; vector store version {result['version']} is current")
+    else:
+        print(f"Vector store version {result['version']}: "
+              f"{result['reused']} chunks reused, {result['embedded']} embedded")
+
+
+def benchmark_index(args):
+    import json
+
+    import numpy as np
+
+    from app.services import ann_index, vector_store
+
+    if args.synthetic:
+        embeddings = ann_index.synthetic_embeddings(args.synthetic, args.dim)
+        corpus = f"synthetic {args.synthetic} x {args.dim}"
+    else:
+        version = vector_store.current_version()
+        embeddings = np.asarray(vector_store.open_embeddings(version), dtype=np.float32)
+        corpus = f"store {version}"
+
+    # Queries: stored vectors with small noise, so no embedding calls are needed.
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.integers(0, len(embeddings), args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    configs = [(name, {}) for name in (args.type or ann_index.INDEX_TYPES)]
+    results = ann_index.benchmark(embeddings, queries, k=args.k, configs=configs)
+    print(f"{corpus}, {args.queries} queries, recall@{args.k} vs exact inner product")
+    for row in results:
+        if "error" in row:
+            print(f"  {row['type']:<9} error: {row['error']}")
+            continue
+        print(f"  {row['type']:<9} recall {row['recall_at_k']:.3f}  "
+              f"mean {row['latency_ms_mean']:.3f} ms  p95 {row['latency_ms_p95']:.3f} ms  "
+              f"{row['index_bytes'] / 2**20:.1f} MiB  build {row['build_seconds']:.2f}s  {row['meta']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"corpus": corpus, "k": args.k, "results": results}, f, indent=2)
+
+
+def benchmark(args):
+    import json
+    import platform
+    import subprocess
+    import time
+
+    from app.benchmarks import load, micro
+
+    results = {
+        "commit": subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                 capture_output=True, text=True).stdout.strip() or None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+    }
+    if args.suite in ("micro", "all"):
+        results["micro"] = micro.run_suite(repeat=args.repeat)
+        for name, row in results["micro"].items():
+            p50 = f"p50 {row['p50_us']:10.1f} us  p95 {row['p95_us']:10.1f} us" if "p50_us" in row \
+                else f"{row['mean_us']:10.1f} us"
+            print(f"  {name:<36} {p50}")
+    if args.suite in ("load", "all"):
+        fake_env = {"FAKE_CHAT_LATENCY": str(args.chat_latency), "FAKE_EMBED_LATENCY": str(args.embed_latency),
+                    "FAKE_LATENCY_DIST": args.latency_dist}
+        results["load"] = load.run_suite(args.endpoint, args.concurrency or [1, 8, 32], args.requests,
+                                         url=args.url, fake_env=fake_env, workers=args.workers)
+        for name, row in results["load"].items():
+            print(f"  {name:<32} {row['rps']:7.1f} rps  p50 {row['p50_ms']:8.1f} ms  "
+                  f"p95 {row['p95_ms']:8.1f} ms  p99 {row['p99_ms']:8.1f} ms  errors {row['errors']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.baseline} (commit {baseline.get('commit')}), >1 is slower:")
+        for suite, key in (("micro", "p50_us"), ("load", "p95_ms")):
+            for name, ratio in micro.compare(results.get(suite, {}), baseline.get(suite, {}), key).items():
+                print(f"  {name:<36} {key} x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    warm = commands.add_parser("warm-embeddings", help="Pre-embed every templated sign/house query")
+    warm.set_defaults(func=warm_embeddings)
+
+    pre = commands.add_parser("precompute", help="Generate every sign x house overview and plan into the store")
+    pre.add_argument("--language", action="append", default=[],
+                     help="Language to generate for (repeatable, default the canonical language)")
+    pre.add_argument("--kind", action="append", choices=["overview", "plan"],
+                     help="Only generate this kind (repeatable)")
+    pre.add_argument("--workers", type=int, default=4, help="Concurrent generations")
+    pre.add_argument("--force", action="store_true", help="Regenerate entries already stored")
+    pre.set_defaults(func=precompute)
+
+    table = commands.add_parser("build-chiron-table", help="Build and verify the Chiron longitude table")
+    table.add_argument("--start-year", type=int, default=1900)
+    table.add_argument("--end-year", type=int, default=2100)
+    table.set_defaults(func=build_chiron_table)
+
+    gaz = commands.add_parser("import-gazetteer", help="Build the offline gazetteer from a GeoNames dump")
+    gaz.add_argument("dump", help="GeoNames export, e.g. cities500.zip or allCountries.txt")
+    gaz.add_argument("--output", help="SQLite file to write (default GAZETTEER_FILE)")
+    gaz.add_argument("--min-population", type=int, default=0, help="Skip smaller places")
+    gaz.set_defaults(func=import_gazetteer)
+
+    report = commands.add_parser("startup-report", help="Break down import and init cost per component")
+    report.set_defaults(func=startup_report)
+
+    migrate = commands.add_parser("migrate-store", help="Convert the legacy pickle store to the mmap format")
+    migrate.add_argument("--embeddings", default="app/vector_db/embeddings.pkl")
+    migrate.add_argument("--index", default="app/vector_db/faiss.index")
+    migrate.set_defaults(func=migrate_store)
+
+    ing = commands.add_parser("ingest", help="Re-index the documents, embedding only changed chunks")
+    ing.add_argument("--pdf", action="append",
+                     help="PDF or directory of PDFs to index; repeatable (default DOCUMENT_PATHS)")
+    ing.add_argument("--max-len", type=int, default=200, help="Words per chunk")
+    ing.add_argument("--overlap", type=int, help="Words shared by consecutive chunks (default CHUNK_OVERLAP)")
+    ing.add_argument("--workers", type=int, help="Page extraction processes (default INGEST_WORKERS)")
+    ing.add_argument("--chunking", choices=("words", "sections"),
+                     help="Fixed word windows or sign/house sections (default CHUNK_METHOD)")
+    ing.add_argument("--index-type", help="FAISS index type (default INDEX_TYPE)")
+    ing.add_argument("--force", action="store_true", help="Rebuild even if the sources are unchanged")
+    ing.set_defaults(func=ingest)
+
+    bench = commands.add_parser("benchmark-index", help="Compare FAISS index types: recall, latency, size")
+    bench.add_argument("--type", action="append", help="Index type to include (repeatable, default all)")
+    bench.add_argument("--k", type=int, default=5)
+    bench.add_argument("--queries", type=int, default=200)
+    bench.add_argument("--synthetic", type=int, help="Benchmark N synthetic vectors instead of the store")
+    bench.add_argument("--dim", type=int, default=1536, help="Dimension of synthetic vectors")
+    bench.add_argument("--json", help="Also write the results to this JSON file")
+    bench.set_defaults(func=benchmark_index)
+
+    bm = commands.add_parser("benchmark", help="Micro and load benchmarks against a local fake OpenAI server")
+    bm.add_argument("--suite", choices=("micro", "load", "all"), default="all")
+    bm.add_argument("--repeat", type=int, default=200, help="Calls per microbenchmark")
+    bm.add_argument("--endpoint", action="append",
+                    choices=("generate_plan", "generate_overview", "generate_overview_end_user"),
+                    help="Endpoint to load-test (repeatable, default all)")
+    bm.add_argument("--concurrency", type=int, action="append", help="Concurrency level (repeatable, default 1, 8, 32)")
+    bm.add_argument("--requests", type=int, default=200, help="Requests per endpoint and level")
+    bm.add_argument("--workers", type=int, default=1, help="Service worker processes when started locally")
+    bm.add_argument("--url", help="Load-test this running service instead of starting one")
+    bm.add_argument("--chat-latency", type=float, default=0.8, help="Median fake chat completion latency (s)")
+    bm.add_argument("--embed-latency", type=float, default=0.05, help="Median fake embedding latency (s)")
+    bm.add_argument("--latency-dist", choices=("fixed", "uniform", "lognormal"), default="lognormal")
+    bm.add_argument("--json", help="Write the results to this JSON file")
+    bm.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    bm.set_defaults(func=benchmark)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
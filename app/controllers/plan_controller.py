@@ -1,54 +1,44 @@
-from fastapi import APIRouter, HTTPException
-from app.models.plan_model import PlanRequest, PlanResponse, PlanEndUserRequest
-from app.models.overview_model import OverviewResponse
-from app.services.pdf_service import extract_text_from_pdf, chunk_text
-from app.services.embedding_service import (
-    load_embeddings, save_embeddings, embed_chunks,
-    create_faiss_index, save_faiss_index, load_faiss_index, search_index
-)
-from app.services.healing_service import generate_healing_plan
-from app.services.overview_service import generate_overview
-from app.services.sign_house_convector import calculate_chiron_position
-from app.services.location_convector import get_lat_lon_timezone
-
+import asyncio
+import json
+import logging
 import os
 
-router = APIRouter()
-
-PDF_PATH = os.getenv("PDF_PATH", "app/document/Chiron_Healing_Map.pdf")
-EMB_FILE = os.getenv("EMB_FILE", "app/vector_db/embeddings.pkl")
-INDEX_FILE = os.getenv("INDEX_FILE", "app/vector_db/faiss.index")
-
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.models.plan_model import PlanRequest, PlanResponse, PlanEndUserRequest, PlanEndUserBatchRequest
+from app.models.overview_model import OverviewResponse, OverviewBatchItem, OverviewBatchResponse
+from app.services.context_service import build_context
+from app.services.healing_service import generate_healing_plan, stream_healing_plan
+from app.services.overview_service import generate_overview, stream_overview
+from app.services.sign_house_convector import calculate_chiron_position, calculate_chiron_positions, ordinal
+from app.services.location_convector import get_lat_lon_timezone, get_lat_lon_timezone_many, birth_timezone_offset
+from app.services.executor import run_blocking
+from app.services.json_stream import replay_events
+from app.services.openai_clients import UpstreamUnavailable
+from app.services import generation_store, metrics
 
-def _prepare_index():
-    embeddings, chunks = load_embeddings(EMB_FILE)
-    index = load_faiss_index(INDEX_FILE)
+router = APIRouter()
+log = logging.getLogger(__name__)
 
-    if embeddings is None or index is None:
-        # First-time load
-        text = extract_text_from_pdf(PDF_PATH)
-        chunks = chunk_text(text, max_len=200)
-        embeddings = embed_chunks(chunks)
-        save_embeddings(embeddings, chunks, EMB_FILE)
+# Concurrent generations per batch request
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
 
-        index = create_faiss_index(embeddings)
-        save_faiss_index(index, INDEX_FILE)
 
-    return embeddings, chunks, index
+async def _from_store(kind: str, sign: str, house: str, language: str) -> dict | None:
+    """Precomputed payload when SERVE_FROM_STORE is on; None means generate live."""
+    if not generation_store.SERVE_FROM_STORE:
+        return None
+    return await run_blocking(generation_store.get, kind, sign, house, language)
 
 
 @router.post("/generate_plan", response_model=PlanResponse)
-def generate_plan(request: PlanRequest):
-    embeddings, chunks, index = _prepare_index()
-    questionForSign="Chiron in "+request.sign+ "House, Life Area Focus Extra Daily, Prompt, meditation"
-    questionForHouse=request.house +"House, Life Area Focus Extra Daily, Prompt, meditation"
-    indicesSign = search_index(index, questionForSign, top_k=2)
-    indicesHouse = search_index(index, questionForHouse, top_k=2)
-    relevant_chunks_sign = [chunks[i] for i in indicesSign]
-    relevant_chunks_house = [chunks[i] for i in indicesHouse]
-    context = "\n\n".join(relevant_chunks_sign + relevant_chunks_house)
-
-    plan_list = generate_healing_plan(context, request.sign, request.house)
+async def generate_plan(request: PlanRequest):
+    stored = await _from_store("plan", request.sign, request.house, request.language)
+    if stored:
+        return PlanResponse(**stored)
+
+    context = await build_context(request.sign, request.house)
+    plan_list = await generate_healing_plan(context, request.sign, request.house, request.language)
 
     if not plan_list:
         raise HTTPException(status_code=500, detail="LLM could not generate a valid plan")
@@ -61,17 +51,13 @@ def generate_plan(request: PlanRequest):
 
 
 @router.post("/generate_overview", response_model=OverviewResponse)
-def generate_overview_route(request: PlanRequest):
-    embeddings, chunks, index = _prepare_index()
-    questionForSign="Chiron in "+request.sign+ "House, Life Area Focus Extra Daily, Prompt, meditation"
-    questionForHouse=request.house +"House, Life Area Focus Extra Daily, Prompt, meditation"
-    indicesSign = search_index(index, questionForSign, top_k=2)
-    indicesHouse = search_index(index, questionForHouse, top_k=2)
-    relevant_chunks_sign = [chunks[i] for i in indicesSign]
-    relevant_chunks_house = [chunks[i] for i in indicesHouse]
-    context = "\n\n".join(relevant_chunks_sign + relevant_chunks_house)
-
-    overview = generate_overview(context, request.sign, request.house, request.language)
+async def generate_overview_route(request: PlanRequest):
+    stored = await _from_store("overview", request.sign, request.house, request.language)
+    if stored:
+        return OverviewResponse(**stored)
+
+    context = await build_context(request.sign, request.house)
+    overview = await generate_overview(context, request.sign, request.house, request.language)
 
     if not overview:
         raise HTTPException(status_code=500, detail="LLM could not generate a valid overview")
@@ -82,51 +68,216 @@ def generate_overview_route(request: PlanRequest):
         **overview
     )
 
-@router.post("/generate_overview_end_user", response_model=OverviewResponse)
-def generate_overview_route(request: PlanEndUserRequest):
-    # Step 1: Convert birthPlace → city, country, lat/lon, timezone
-    if ',' in request.birthPlace:
-        city_input, country_input = [x.strip() for x in request.birthPlace.split(',', 1)]
+def _ndjson(event: dict) -> str:
+    return json.dumps(event) + "\n"
+
+
+async def _replay(events):
+    for event in events:
+        yield event
+
+
+@router.post("/generate_plan/stream")
+async def generate_plan_stream(request: PlanRequest):
+    """NDJSON stream: one {"type": "day"} line per plan day, then "done" or "error"."""
+    async def events():
+        stored = await _from_store("plan", request.sign, request.house, request.language)
+        if stored:
+            days = _replay(replay_events(stored["plan"]))
+        else:
+            context = await build_context(request.sign, request.house)
+            days = stream_healing_plan(context, request.sign, request.house, request.language)
+
+        count, complete = 0, False
+        async for event in days:
+            if event[0] == "item":
+                yield _ndjson({"type": "day", "index": count, "day": event[1]})
+                count += 1
+            elif event[0] == "end":
+                complete = True
+
+        # Without an "end" event the stream failed, even if some days went out.
+        if complete:
+            yield _ndjson({"type": "done", "sign": request.sign, "house": request.house, "days": count})
+        else:
+            yield _ndjson({"type": "error", "detail": "LLM could not generate a valid plan"})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@router.post("/generate_overview/stream")
+async def generate_overview_stream(request: PlanRequest):
+    """NDJSON stream: one {"type": "field"} line per overview field, then "done" or "error"."""
+    async def events():
+        stored = await _from_store("overview", request.sign, request.house, request.language)
+        if stored:
+            fields = _replay(replay_events({k: v for k, v in stored.items() if k not in ("sign", "house")}))
+        else:
+            context = await build_context(request.sign, request.house)
+            fields = stream_overview(context, request.sign, request.house, request.language)
+
+        complete = False
+        async for event in fields:
+            if event[0] == "field":
+                yield _ndjson({"type": "field", "name": event[1], "value": event[2]})
+            elif event[0] == "end":
+                complete = True
+
+        if complete:
+            yield _ndjson({"type": "done", "sign": request.sign, "house": request.house})
+        else:
+            yield _ndjson({"type": "error", "detail": "LLM could not generate a valid overview"})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+def _split_birth_place(birth_place: str) -> tuple[str, str]:
+    """Split "City, Country" into (country_input, city_input)."""
+    if ',' in birth_place:
+        city_input, country_input = [x.strip() for x in birth_place.split(',', 1)]
     else:
-        city_input = request.birthPlace.strip()
+        city_input = birth_place.strip()
         country_input = ""  # Let service fuzzy match country if possible
+    return country_input, city_input
+
 
-    loc_info = get_lat_lon_timezone(country_input, city_input)
-    if not loc_info:
+def _resolve_birth_places(birth_places: list[str]) -> dict:
+    """Resolve each distinct birthPlace once: birthPlace -> loc_info or None."""
+    places = list(set(birth_places))
+    return dict(zip(places, get_lat_lon_timezone_many([_split_birth_place(p) for p in places])))
+
+
+async def _end_user_overview(sign: str, house: str, language: str) -> OverviewResponse | None:
+    stored = await _from_store("overview", sign, house, language)
+    if stored:
+        return OverviewResponse(**stored)
+
+    context = await build_context(sign, house)
+    overview = await generate_overview(context, sign, house, language)
+    if not overview:
+        return None
+    return OverviewResponse(sign=sign, house=house, **overview)
+
+
+@router.post("/generate_overview_end_user", response_model=OverviewResponse)
+async def generate_overview_route(request: PlanEndUserRequest):
+    # Step 1: Convert birthPlace → city, country, lat/lon, timezone
+    country_input, city_input = _split_birth_place(request.birthPlace)
+    with metrics.stage("location"):
+        loc_info = await run_blocking(get_lat_lon_timezone, country_input, city_input)
+    if not loc_info or not loc_info["timezone"]:
         raise HTTPException(status_code=400, detail="Could not resolve birthPlace to a valid location")
 
-    # Step 2: Calculate Chiron → sign and house
-    chiron_info = calculate_chiron_position(
-        birth_date=request.birthDate,
-        birth_time=request.birthTime,
-        timezone=loc_info["timezone_offset"],
-        latitude=loc_info["latitude"],
-        longitude=loc_info["longitude"]
-    )
+    # Step 2: Calculate Chiron → sign and house, using the UTC offset in force at birth
+    try:
+        timezone_offset = birth_timezone_offset(loc_info["timezone"], request.birthDate, request.birthTime)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="birthDate/birthTime must be YYYY-MM-DD and HH:MM")
+    with metrics.stage("ephemeris"):
+        chiron_info = await run_blocking(
+            calculate_chiron_position,
+            birth_date=request.birthDate,
+            birth_time=request.birthTime,
+            timezone=timezone_offset,
+            latitude=loc_info["latitude"],
+            longitude=loc_info["longitude"]
+        )
 
     sign = chiron_info["zodiac_sign"]
     chiron_house = chiron_info["house"]
     house=ordinal(chiron_house)
 
-    # Step 3: Prepare context and call generate_overview
-    embeddings, chunks, index = _prepare_index()
-    indices = search_index(index, request.language, top_k=3) 
-    relevant_chunks = [chunks[i] for i in indices]
-    context = "\n\n".join(relevant_chunks)
-
-    overview = generate_overview(context, sign, house, request.language)
+    # Step 3: Serve the precomputed overview, or prepare context and call generate_overview
+    overview = await _end_user_overview(sign, house, request.language)
     if not overview:
         raise HTTPException(status_code=500, detail="LLM could not generate a valid overview")
 
     # Step 4: Return response
-    return OverviewResponse(
-        sign=sign,
-        house=house,
-        **overview
-    )
-def ordinal(n: int) -> str:
-    if 10 <= n % 100 <= 20:  # handles 11th, 12th, 13th, etc.
-        suffix = "th"
-    else:
-        suffix = {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
-    return f"{n}{suffix}"
\ No newline at end of file
+    return overview
+
+
+def _chiron_positions(records: list[dict]) -> list:
+    """calculate_chiron_positions; if the batch fails, each record on its own so one bad row stays in its slot."""
+    try:
+        return calculate_chiron_positions(records)
+    except Exception as e:
+        log.warning("Batch Chiron calculation failed (%s); retrying row by row", e)
+    results = []
+    for record in records:
+        try:
+            results.append(calculate_chiron_position(**record))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+@router.post("/generate_overview_end_user/batch", response_model=OverviewBatchResponse)
+async def generate_overview_end_user_batch(request: PlanEndUserBatchRequest):
+    """
+    Batch version of /generate_overview_end_user.
+
+    Rows sharing a (sign, house, language) share one generation; failures are
+    reported per row in input order instead of failing the batch.
+    """
+    records = request.records
+    results = [OverviewBatchItem(index=i) for i in range(len(records))]
+
+    # Step 1: Resolve each distinct birthPlace once
+    with metrics.stage("location"):
+        locations = await run_blocking(_resolve_birth_places, [r.birthPlace for r in records])
+
+    # Step 2: Calculate Chiron for every resolved row in one vectorized call
+    rows, chiron_inputs = [], []
+    for i, record in enumerate(records):
+        loc_info = locations[record.birthPlace]
+        if not loc_info or not loc_info["timezone"]:
+            results[i].error = "Could not resolve birthPlace to a valid location"
+            continue
+        try:
+            timezone_offset = birth_timezone_offset(loc_info["timezone"], record.birthDate, record.birthTime)
+        except ValueError:
+            results[i].error = "birthDate/birthTime must be YYYY-MM-DD and HH:MM"
+            continue
+        except Exception as e:
+            log.warning("Batch row %d: timezone offset failed: %s", i, e)
+            results[i].error = f"Could not resolve the UTC offset: {e}"
+            continue
+        rows.append(i)
+        chiron_inputs.append({
+            "birth_date": record.birthDate,
+            "birth_time": record.birthTime,
+            "timezone": timezone_offset,
+            "latitude": loc_info["latitude"],
+            "longitude": loc_info["longitude"],
+        })
+    with metrics.stage("ephemeris"):
+        chiron_infos = await run_blocking(_chiron_positions, chiron_inputs)
+
+    # Step 3: Group rows by placement
+    groups = {}
+    for i, chiron_info in zip(rows, chiron_infos):
+        if isinstance(chiron_info, Exception):
+            results[i].error = str(chiron_info)
+            continue
+        key = (chiron_info["zodiac_sign"], ordinal(chiron_info["house"]), records[i].language)
+        groups.setdefault(key, []).append(i)
+
+    # Step 4: Generate once per group with bounded concurrency, then fan out
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(key, indices):
+        async with semaphore:
+            try:
+                overview, error = await _end_user_overview(*key), "LLM could not generate a valid overview"
+            except UpstreamUnavailable:
+                overview, error = None, "LLM provider temporarily unavailable"
+            except Exception as e:
+                log.exception("Batch overview for %s failed", key)
+                overview, error = None, f"Could not generate the overview: {e}"
+        for i in indices:
+            if overview:
+                results[i].overview = overview
+            else:
+                results[i].error = error
+
+    await asyncio.gather(*(run(key, indices) for key, indices in groups.items()))
+    return OverviewBatchResponse(results=results)
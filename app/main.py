@@ -1,6 +1,47 @@
-from fastapi import FastAPI
+import logging
+import os
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.controllers import plan_controller
+from app.services import metrics
+from app.services.openai_clients import UpstreamUnavailable
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
 
 app = FastAPI(title="Healing Journey API")
 
-app.include_router(plan_controller.router, prefix="/healing")
\ No newline at end of file
+app.include_router(plan_controller.router, prefix="/healing")
+
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable(request: Request, exc: UpstreamUnavailable):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "LLM provider temporarily unavailable"},
+        headers={"Retry-After": str(int(exc.retry_after + 0.5))},
+    )
+
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Record request latency and report per-stage durations in a Server-Timing header."""
+    start = time.perf_counter()
+    with metrics.request_timings() as timings:
+        response = await call_next(request)
+    total = time.perf_counter() - start
+    route = request.scope.get("route")
+    metrics.observe("http_request_seconds", total, route=getattr(route, "path", "unmatched"))
+    # Streaming responses send headers before their body is generated, so
+    # only stages finished by then are reported.
+    response.headers["Server-Timing"] = metrics.server_timing(timings, total)
+    return response
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_route():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class OverviewResponse(BaseModel):
     sign: str
@@ -13,5 +13,26 @@ class OverviewResponse(BaseModel):
     patternsConnectedToThisWound: List[str]
     healingBenefits: List[str]
     reflectiveQuestions: List[str]
-  
-    
+
+
+class OverviewContent(BaseModel):
+    """The generated part of an overview (OverviewResponse without sign/house)."""
+    description: str
+    coreWoundsAndEmotionalThemes: List[str]
+    patternsAndStruggles: List[str]
+    healingAndTransformation: List[str]
+    spiritualWisdomAndGifts: List[str]
+    woundPoints: List[str]
+    patternsConnectedToThisWound: List[str]
+    healingBenefits: List[str]
+    reflectiveQuestions: List[str]
+
+
+class OverviewBatchItem(BaseModel):
+    index: int
+    overview: Optional[OverviewResponse] = None
+    error: Optional[str] = None
+
+
+class OverviewBatchResponse(BaseModel):
+    results: List[OverviewBatchItem]
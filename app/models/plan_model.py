@@ -14,5 +14,19 @@ class PlanEndUserRequest(BaseModel):
     birthPlace: str
     language: str
 
+class PlanEndUserBatchRequest(BaseModel):
+    records: List[PlanEndUserRequest]
+
+class PlanDay(BaseModel):
+    overview: str
+    activity: str
+    prompts: List[str]
+    meditation: str
+    affirmation: str
+
+class PlanContent(BaseModel):
+    """What the LLM is asked to produce for a plan."""
+    plan: List[PlanDay]
+
 class PlanResponse(BaseModel):
     plan: list
\ No newline at end of file
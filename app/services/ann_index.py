@@ -0,0 +1,178 @@
+"""
+Configurable FAISS index construction.
+
+INDEX_TYPES maps a name to a builder:
+  flat_l2   exact L2 search (the original index)
+  flat_ip   exact inner product; equals cosine on normalized OpenAI embeddings
+  ivf_flat  inverted lists over raw vectors; search visits nprobe lists
+  ivf_pq    inverted lists over product-quantized codes; smallest, lossy
+  hnsw      graph index; search explores efSearch candidates
+
+Trained types learn their coarse quantizer / codebooks from the stored
+embeddings. The type and parameters are returned as metadata, persisted in
+the store manifest and re-applied when the index is opened, so search-time
+knobs (nprobe, efSearch) survive a restart and can be overridden by env.
+"""
+import math
+import os
+import time
+
+import faiss
+import numpy as np
+
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat_ip")
+# Search-time overrides; unset keeps the value stored with the index.
+INDEX_NPROBE = os.getenv("INDEX_NPROBE")
+INDEX_EF_SEARCH = os.getenv("INDEX_EF_SEARCH")
+
+ADD_BLOCK_ROWS = 65536
+
+
+def _nlist(n: int) -> int:
+    # ~4*sqrt(n) lists, with at least ~39 training points per list
+    return max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+
+
+def _pq_m(dim: int, target: int = 64) -> int:
+    """Largest sub-quantizer count <= target that divides dim."""
+    return next(m for m in range(min(target, dim), 0, -1) if dim % m == 0)
+
+
+def _flat_l2(dim, n, params):
+    return faiss.IndexFlatL2(dim), {}
+
+
+def _flat_ip(dim, n, params):
+    return faiss.IndexFlatIP(dim), {}
+
+
+def _ivf_flat(dim, n, params):
+    nlist = int(params.get("nlist") or _nlist(n))
+    quantizer = faiss.IndexFlatIP(dim)
+    index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    return index, {"nlist": nlist, "nprobe": int(params.get("nprobe") or max(1, nlist // 8))}
+
+
+def _ivf_pq(dim, n, params):
+    nlist = int(params.get("nlist") or _nlist(n))
+    m = int(params.get("m") or _pq_m(dim))
+    # k-means needs at least 2**nbits training points per sub-quantizer
+    nbits = int(params.get("nbits") or max(1, min(8, int(math.log2(max(n, 2))))))
+    quantizer = faiss.IndexFlatIP(dim)
+    index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, nbits, faiss.METRIC_INNER_PRODUCT)
+    return index, {"nlist": nlist, "m": m, "nbits": nbits,
+                   "nprobe": int(params.get("nprobe") or max(1, nlist // 8))}
+
+
+def _hnsw(dim, n, params):
+    M = int(params.get("M") or 32)
+    index = faiss.IndexHNSWFlat(dim, M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = int(params.get("efConstruction") or 80)
+    return index, {"M": M, "efConstruction": index.hnsw.efConstruction,
+                   "efSearch": int(params.get("efSearch") or 64)}
+
+
+INDEX_TYPES = {
+    "flat_l2": _flat_l2,
+    "flat_ip": _flat_ip,
+    "ivf_flat": _ivf_flat,
+    "ivf_pq": _ivf_pq,
+    "hnsw": _hnsw,
+}
+
+
+def build_faiss_index(embeddings: np.ndarray, index_type: str = None, **params):
+    """
+    Build (and train, if needed) an index over embeddings.
+
+    embeddings may be a memory-mapped array; vectors are added in blocks.
+    Returns (index, meta) where meta records the type and every parameter
+    needed to rebuild it or restore its search settings.
+    """
+    index_type = index_type or INDEX_TYPE
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {sorted(INDEX_TYPES)}")
+    n, dim = embeddings.shape
+    index, meta = INDEX_TYPES[index_type](dim, n, params)
+
+    if not index.is_trained:
+        if index_type == "ivf_pq" and n < 2 ** meta["nbits"]:
+            raise ValueError(f"ivf_pq with nbits={meta['nbits']} needs at least {2 ** meta['nbits']} vectors")
+        index.train(np.ascontiguousarray(embeddings, dtype=np.float32))
+    for start in range(0, n, ADD_BLOCK_ROWS):
+        index.add(np.ascontiguousarray(embeddings[start:start + ADD_BLOCK_ROWS], dtype=np.float32))
+
+    meta = dict(meta, type=index_type)
+    apply_search_params(index, meta)
+    return index, meta
+
+
+def apply_search_params(index, meta: dict):
+    """Set nprobe / efSearch from meta, with INDEX_NPROBE / INDEX_EF_SEARCH taking precedence."""
+    nprobe = INDEX_NPROBE or meta.get("nprobe")
+    ef_search = INDEX_EF_SEARCH or meta.get("efSearch")
+    ivf = faiss.try_extract_index_ivf(index) if meta.get("nlist") else None
+    if ivf is not None and nprobe:
+        ivf.nprobe = int(nprobe)
+    if hasattr(index, "hnsw") and ef_search:
+        index.hnsw.efSearch = int(ef_search)
+    return index
+
+
+def index_bytes(index) -> int:
+    """Serialized size of the index, a proxy for its resident memory."""
+    return int(faiss.serialize_index(index).size)
+
+
+def benchmark(embeddings: np.ndarray, queries: np.ndarray, k: int = 5,
+              configs: list[tuple[str, dict]] = None) -> list[dict]:
+    """
+    Recall@k against exact inner-product search, plus build time, per-query
+    latency (mean and p95, single-query searches) and index size for each
+    (index_type, params) config.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    k = min(k, len(embeddings))
+    exact, _ = build_faiss_index(embeddings, "flat_ip")
+    _, truth = exact.search(queries, k)
+
+    configs = configs or [(name, {}) for name in INDEX_TYPES]
+    results = []
+    for index_type, params in configs:
+        row = {"type": index_type, "params": params}
+        try:
+            start = time.perf_counter()
+            index, meta = build_faiss_index(embeddings, index_type, **params)
+            row["build_seconds"] = time.perf_counter() - start
+        except (ValueError, RuntimeError) as e:
+            row["error"] = str(e)
+            results.append(row)
+            continue
+
+        latencies = []
+        found = np.empty_like(truth)
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            _, found[i] = index.search(query.reshape(1, -1), k)
+            latencies.append(time.perf_counter() - start)
+        hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+
+        row.update(
+            meta=meta,
+            recall_at_k=hits / truth.size,
+            latency_ms_mean=1000 * float(np.mean(latencies)),
+            latency_ms_p95=1000 * float(np.percentile(latencies, 95)),
+            index_bytes=index_bytes(index),
+        )
+        results.append(row)
+    return results
+
+
+def synthetic_embeddings(n: int, dim: int, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, for benchmarking corpus sizes we do not have yet."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
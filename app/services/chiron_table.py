@@ -0,0 +1,122 @@
+"""
+Precomputed Chiron longitude table.
+
+Chiron's geocentric longitude is sampled once a day with Swiss Ephemeris and
+stored unwrapped (continuous across 360°) as a float32 .npy file. Lookups
+memory-map the file and linearly interpolate, so converting any number of
+Julian days is one vectorized NumPy call with no ephemeris files involved.
+
+Maximum error against swisseph.calc_ut: daily sampling with linear
+interpolation stays below MAX_ERROR_DEG (0.001°, about 3.6 arcseconds) over
+the table range; the build samples random instants and refuses to write a
+table that exceeds it. The measured error is stored in the metadata file.
+"""
+import json
+import os
+
+import numpy as np
+import swisseph as swe
+
+from app.services.lazy import Lazy
+
+TABLE_FILE = os.getenv("CHIRON_TABLE_FILE", "app/ephe/chiron_longitude.npy")
+META_FILE = os.path.splitext(TABLE_FILE)[0] + ".json"
+
+START_YEAR = 1900
+END_YEAR = 2100
+STEP_DAYS = 1.0
+MAX_ERROR_DEG = 0.001
+
+SIGNS = [
+    'Aries', 'Taurus', 'Gemini', 'Cancer', 'Leo', 'Virgo',
+    'Libra', 'Scorpio', 'Sagittarius', 'Capricorn', 'Aquarius', 'Pisces'
+]
+
+
+
+def _swisseph_longitudes(jds) -> np.ndarray:
+    return np.array([swe.calc_ut(float(jd), swe.CHIRON)[0][0] for jd in jds])
+
+
+def _interpolate(table: np.ndarray, meta: dict, jd: np.ndarray) -> np.ndarray:
+    pos = (jd - meta["jd_start"]) / meta["step_days"]
+    i = np.clip(np.floor(pos).astype(np.int64), 0, len(table) - 2)
+    frac = pos - i
+    lower = table[i].astype(np.float64)
+    upper = table[i + 1].astype(np.float64)
+    return np.mod(lower + (upper - lower) * frac, 360.0)
+
+
+def build_table(ephe_path: str, start_year: int = START_YEAR, end_year: int = END_YEAR,
+                step_days: float = STEP_DAYS, samples: int = 5000) -> dict:
+    """
+    Sample Chiron with swisseph, verify interpolation error and write the table.
+
+    Raises ValueError if the verified maximum error exceeds MAX_ERROR_DEG.
+    """
+    swe.set_ephe_path(ephe_path)
+    jd_start = swe.julday(start_year, 1, 1, 0.0)
+    jd_end = swe.julday(end_year, 1, 1, 0.0)
+    jds = np.arange(jd_start, jd_end + step_days, step_days)
+    longitudes = np.degrees(np.unwrap(np.radians(_swisseph_longitudes(jds))))
+    table = longitudes.astype(np.float32)
+
+    meta = {
+        "jd_start": float(jd_start),
+        "jd_end": float(jds[-1]),
+        "step_days": step_days,
+        "count": len(table),
+        "start_year": start_year,
+        "end_year": end_year,
+    }
+
+    rng = np.random.default_rng(0)
+    check = rng.uniform(jd_start, jds[-1], samples)
+    diff = _interpolate(table, meta, check) - _swisseph_longitudes(check)
+    max_error = float(np.abs((diff + 180.0) % 360.0 - 180.0).max())
+    if max_error > MAX_ERROR_DEG:
+        raise ValueError(f"Chiron table error {max_error:.6f}° exceeds {MAX_ERROR_DEG}°")
+    meta["max_error_deg"] = max_error
+    meta["verified_samples"] = samples
+
+    np.save(TABLE_FILE, table)
+    with open(META_FILE, "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def _load_table():
+    with open(META_FILE) as f:
+        meta = json.load(f)
+    return np.load(TABLE_FILE, mmap_mode="r"), meta
+
+
+_table = Lazy("chiron longitude table", _load_table)
+
+
+def _load():
+    return _table.get()
+
+
+def available() -> bool:
+    return os.path.exists(TABLE_FILE) and os.path.exists(META_FILE)
+
+
+def in_range(jd) -> np.ndarray:
+    """Boolean mask of the Julian days in jd that lie inside the table range."""
+    _, meta = _load()
+    jd = np.asarray(jd, dtype=np.float64)
+    return (jd >= meta["jd_start"]) & (jd <= meta["jd_end"])
+
+
+def chiron_longitudes(jd) -> np.ndarray:
+    """Vectorized Chiron longitude (degrees, 0-360) for an array of Julian days (UT)."""
+    table, meta = _load()
+    return _interpolate(table, meta, np.asarray(jd, dtype=np.float64))
+
+
+def chiron_signs(jd) -> tuple[np.ndarray, list[str]]:
+    """Longitudes and zodiac sign names for an array of Julian days (UT)."""
+    longitudes = chiron_longitudes(jd)
+    sign_index = (longitudes // 30).astype(np.int64) % 12
+    return longitudes, [SIGNS[i] for i in sign_index]
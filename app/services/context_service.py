@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import os
+from itertools import zip_longest
+
+import numpy as np
+
+from app.services import metrics
+from app.services.embedding_service import embed_query, search_index
+from app.services.executor import run_blocking
+from app.services.pdf_service import section_tags
+from app.services.retrieval_store import RetrievalSnapshot, get_snapshot
+from app.services.query_templates import sign_query, house_query
+
+# "hybrid" fuses BM25 and vector rankings, "lexical" never calls the
+# embeddings API, "vector" is FAISS only. Stores without a lexical index
+# always use vector search.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# In hybrid mode, give up on the vector side after this many seconds and
+# answer from BM25 alone.
+HYBRID_VECTOR_TIMEOUT = float(os.getenv("HYBRID_VECTOR_TIMEOUT", "2"))
+RRF_K = 60
+
+log = logging.getLogger(__name__)
+
+
+def reciprocal_rank_fusion(rankings: list[list[int]], top_k: int, k: int = RRF_K) -> list[int]:
+    """Merge ranked id lists by summing 1 / (k + rank) per id."""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:top_k]
+
+
+async def _vector_ranking(store: RetrievalSnapshot, query: str, top_k: int, candidates: list[int] = None) -> list[int]:
+    if candidates is None:
+        return [int(i) for i in await search_index(store.index, query, top_k=top_k) if i >= 0]
+    query_vec = await embed_query(query)
+    with metrics.stage("search"):
+        distances = ((store.embeddings[candidates] - query_vec) ** 2).sum(axis=1)
+    return [candidates[i] for i in np.argsort(distances, kind="stable")[:top_k]]
+
+
+async def search(store: RetrievalSnapshot, query: str, top_k: int, candidates: list[int] = None,
+                 mode: str = None) -> list[int]:
+    """
+    Top chunk ids for query under RETRIEVAL_MODE, optionally restricted to candidates.
+
+    Hybrid mode runs BM25 locally and fuses it with the vector ranking by
+    reciprocal rank fusion; if the embeddings call fails or exceeds
+    HYBRID_VECTOR_TIMEOUT, the BM25 ranking is returned on its own.
+    """
+    mode = mode or RETRIEVAL_MODE
+    if store.lexical is None or mode == "vector":
+        return await _vector_ranking(store, query, top_k, candidates)
+
+    # Rank deeper than top_k so fusion has overlap to work with.
+    with metrics.stage("search"):
+        lexical = store.lexical.search(query, top_k * 4, candidates)
+    if mode == "lexical":
+        return lexical[:top_k]
+    try:
+        vector = await asyncio.wait_for(_vector_ranking(store, query, top_k * 4, candidates), HYBRID_VECTOR_TIMEOUT)
+    except Exception as e:
+        log.warning("Vector search unavailable (%s: %s); using lexical results", type(e).__name__, e)
+        return lexical[:top_k]
+    return reciprocal_rank_fusion([vector, lexical], top_k)
+
+
+async def _section_chunks(store: RetrievalSnapshot, key: str, value: str, query: str, top_k: int) -> list[int]:
+    """
+    Chunk ids for one sign or house.
+
+    Stores built with section chunking answer with a tag lookup; search()
+    only reranks when more than top_k chunks share the tag. Untagged stores
+    and unknown values fall back to a full search.
+    """
+    tag = section_tags(value).get(key)
+    ids = store.tagged(key, tag) if tag else []
+    if not ids:
+        return await search(store, query, top_k)
+    if len(ids) <= top_k:
+        return ids
+    return await search(store, query, top_k, candidates=ids)
+
+
+async def build_context(sign: str, house: str) -> list[str]:
+    """
+    Retrieve the sign and house passages concurrently.
+
+    Returns the chunks interleaved by rank (best sign hit, best house hit,
+    ...) without duplicates, so a token budget trims the weakest hits first.
+    """
+    store = await run_blocking(get_snapshot)
+    indicesSign, indicesHouse = await asyncio.gather(
+        _section_chunks(store, "sign", sign, sign_query(sign), top_k=2),
+        _section_chunks(store, "house", house, house_query(house), top_k=2),
+    )
+    interleaved = [i for pair in zip_longest(indicesSign, indicesHouse) for i in pair if i is not None]
+    return [store.chunks[i] for i in dict.fromkeys(interleaved)]
@@ -1,56 +1,56 @@
-import pickle
 import numpy as np
-import faiss
-from openai import OpenAI
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from app.services.ann_index import build_faiss_index
+from app.services import metrics
+from app.services.executor import run_blocking
+from app.services.openai_clients import OPENAI_EMBED_TIMEOUT, async_client, call, sync_client
+from app.services.query_cache import query_cache
 
 EMBED_MODEL = "text-embedding-3-small"
 
 
 def embed_chunks(chunks: list[str]) -> np.ndarray:
     """Batch embed chunks (fast)."""
-    resp = client.embeddings.create(model=EMBED_MODEL, input=chunks)
+    resp = sync_client().embeddings.create(model=EMBED_MODEL, input=chunks)
     embeddings = [d.embedding for d in resp.data]
     return np.array(embeddings, dtype=np.float32)
 
 
-def save_embeddings(embeddings, chunks, file_path: str):
-    with open(file_path, "wb") as f:
-        pickle.dump((embeddings, chunks), f)
-
-
-def load_embeddings(file_path: str):
-    try:
-        with open(file_path, "rb") as f:
-            return pickle.load(f)
-    except FileNotFoundError:
-        return None, None
-
-
-def create_faiss_index(embeddings: np.ndarray):
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(embeddings)
+def create_faiss_index(embeddings: np.ndarray, index_type: str = None):
+    """Index of the configured INDEX_TYPE (see ann_index) over embeddings."""
+    index, _ = build_faiss_index(embeddings, index_type)
     return index
 
 
-def save_faiss_index(index, file_path: str):
-    faiss.write_index(index, file_path)
-
-
-def load_faiss_index(file_path: str):
-    if os.path.exists(file_path):
-        return faiss.read_index(file_path)
-    return None
-
-
-def search_index(index, query: str, top_k: int = 5) -> list[int]:
+async def embed_query(query: str) -> np.ndarray:
+    """Embed a single query, served from the query cache when possible."""
+    with metrics.stage("embedding"):
+        vector = await run_blocking(query_cache.get, EMBED_MODEL, query)
+        metrics.inc("query_embedding_cache_total", result="miss" if vector is None else "hit")
+        if vector is None:
+            resp = await call(
+                "embeddings",
+                lambda timeout: async_client().embeddings.create(model=EMBED_MODEL, input=query, timeout=timeout),
+                timeout=OPENAI_EMBED_TIMEOUT,
+            )
+            vector = np.array(resp.data[0].embedding, dtype=np.float32)
+            await run_blocking(query_cache.put, EMBED_MODEL, query, vector)
+    return vector
+
+
+def warm_query_cache(queries: list[str]) -> int:
+    """Pre-embed any queries missing from the cache; returns how many were embedded."""
+    missing = [q for q in dict.fromkeys(queries) if query_cache.get(EMBED_MODEL, q) is None]
+    if missing:
+        vectors = embed_chunks(missing)
+        for query, vector in zip(missing, vectors):
+            query_cache.put(EMBED_MODEL, query, vector)
+    return len(missing)
+
+
+async def search_index(index, query: str, top_k: int = 5) -> list[int]:
     """Search FAISS index using query embedding."""
-    resp = client.embeddings.create(model=EMBED_MODEL, input=query)
-    query_vec = np.array([resp.data[0].embedding], dtype=np.float32)
-    distances, indices = index.search(query_vec, top_k)
+    query_vec = (await embed_query(query)).reshape(1, -1)
+    with metrics.stage("search"):
+        distances, indices = await run_blocking(index.search, query_vec, top_k)
     return indices[0]
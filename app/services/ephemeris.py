@@ -0,0 +1,102 @@
+"""
+Swiss Ephemeris engine.
+
+swisseph keeps global C state (the ephemeris path, open files, caches), so
+calc_ut and swe.houses run only here: on a small process pool whose workers
+call swe.set_ephe_path once at start-up, or, with EPHEMERIS_WORKERS=0,
+in-process under one lock.
+
+Work is submitted in batches of charts, (jd_ut, latitude, longitude,
+chiron_longitude) tuples, so many charts cost one IPC round trip. A chart
+with chiron_longitude None has it computed with calc_ut (e.g. outside the
+precomputed table); one with latitude None skips the houses.
+"""
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import swisseph as swe
+
+from app.services.lazy import Lazy
+
+EPHE_PATH = os.getenv("EPHE_PATH", "./app/ephe")
+EPHEMERIS_WORKERS = int(os.getenv("EPHEMERIS_WORKERS", "2"))
+# Charts per batch when a large request is split across the workers
+EPHEMERIS_MIN_BATCH = 64
+
+_lock = threading.Lock()
+_initialized = False
+
+
+def get_house(longitude: float, houses: list[float]) -> int:
+    """
+    Determine which house a given longitude belongs to.
+    Uses Placidus houses.
+    """
+    for i in range(11):  # houses 1–11
+        if houses[i] <= longitude < houses[i + 1]:
+            return i + 1
+    return 12  # wrap-around → house 12
+
+
+def _init(ephe_path: str = EPHE_PATH):
+    """Point swisseph at the ephemeris files; runs once per process."""
+    global _initialized
+    swe.set_ephe_path(ephe_path)
+    _initialized = True
+
+
+def _compute(charts: list[tuple]) -> list[tuple[float, int | None]]:
+    """(chiron_longitude, house or None) for each chart."""
+    results = []
+    for jd_ut, latitude, longitude, chiron_long in charts:
+        if chiron_long is None:
+            chiron_long = swe.calc_ut(jd_ut, swe.CHIRON)[0][0]
+        house = None
+        if latitude is not None:
+            cusps, _ = swe.houses(jd_ut, latitude, longitude, b'P')
+            house = get_house(chiron_long, cusps)
+        results.append((float(chiron_long), house))
+    return results
+
+
+def _compute_locked(charts: list[tuple]) -> list[tuple[float, int | None]]:
+    with _lock:
+        if not _initialized:
+            _init()
+        return _compute(charts)
+
+
+def _build_pool() -> ProcessPoolExecutor:
+    # spawn: the caller may be a threaded server process
+    return ProcessPoolExecutor(max_workers=EPHEMERIS_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init, initargs=(EPHE_PATH,))
+
+
+# Not preloaded: a pool started in the gunicorn master would not survive the fork.
+_pool = Lazy("ephemeris pool", _build_pool, preload=False)
+
+
+def submit(charts: list[tuple]) -> Future:
+    """Compute one batch of charts in a single round trip; the future yields compute()'s result."""
+    if EPHEMERIS_WORKERS <= 0:
+        future = Future()
+        future.set_result(_compute_locked(charts))
+        return future
+    return _pool.get().submit(_compute, charts)
+
+
+def compute(charts: list[tuple]) -> list[tuple[float, int | None]]:
+    """
+    (chiron_longitude, house or None) for every chart, in order.
+
+    Large requests are split into one batch per worker (at least
+    EPHEMERIS_MIN_BATCH charts each) and computed in parallel.
+    """
+    if not charts:
+        return []
+    size = max(EPHEMERIS_MIN_BATCH, math.ceil(len(charts) / max(1, EPHEMERIS_WORKERS)))
+    futures = [submit(charts[i:i + size]) for i in range(0, len(charts), size)]
+    return [result for future in futures for result in future.result()]
@@ -0,0 +1,16 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded pool for CPU-bound or blocking work (FAISS search, ephemeris,
+# fuzzy matching, SQLite) so it never runs on the event loop.
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(8, (os.cpu_count() or 1) * 2))))
+
+_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="blocking")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the bounded executor and await the result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,325 @@
+"""
+Offline gazetteer built from a GeoNames dump.
+
+`python -m app.cli import-gazetteer cities500.zip` reads a GeoNames export
+(allCountries, cities500/1000/5000/15000, a country file; .txt or .zip)
+and writes one SQLite file:
+
+  places  id, name, country, admin1, latitude, longitude, population, timezone, source
+  names   normalized name and alias keys; rowids follow population, largest first
+  grams   (trigram, country) -> packed uint32 name ids, the fuzzy index
+
+Lookups never touch the network. An exact key is a B-tree hit on names; a
+prefix ("frankfurt" -> "frankfurt am main") is a range scan on the same
+index; otherwise candidates are the names sharing the most trigrams with
+the query. Candidates are scored by edit similarity (fuzz.ratio; a
+whole-word prefix scores PREFIX_SCORE) plus POPULATION_WEIGHT *
+log10(population), so the larger of two similarly spelled places wins.
+Reads go through SQLite's mmap, so worker processes share the file's pages.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+from collections import defaultdict
+
+import numpy as np
+from rapidfuzz import fuzz
+
+from app.services import metrics
+from app.services.place_index import normalize, trigrams
+
+GAZETTEER_FILE = os.getenv("GAZETTEER_FILE", "app/vector_db/gazetteer.sqlite")
+GAZETTEER_MMAP_SIZE = int(os.getenv("GAZETTEER_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Fuzzy matches scoring below this (fuzz.ratio, 0-100) are misses
+GAZETTEER_MIN_SCORE = float(os.getenv("GAZETTEER_MIN_SCORE", "80"))
+# Score points per factor of ten in population
+POPULATION_WEIGHT = float(os.getenv("GAZETTEER_POPULATION_WEIGHT", "2"))
+
+# GeoNames feature classes imported: P = populated places
+FEATURE_CLASSES = ("P",)
+MAX_KEYS_PER_PLACE = 64
+PREFIX_CANDIDATES = 50
+# Score of a name the query is a whole-word prefix of ("new york" -> "new york city")
+PREFIX_SCORE = 90.0
+MAX_CANDIDATES = 200
+# Trigrams are read rarest first until their posting lists hold this many ids
+MAX_POSTINGS = 200_000
+
+# GeoNames "geoname" table columns (tab separated, no header)
+_ID, _NAME, _ASCII, _ALTERNATES, _LAT, _LON, _CLASS = 0, 1, 2, 3, 4, 5, 6
+_COUNTRY, _ADMIN1, _POPULATION, _TIMEZONE = 8, 10, 14, 17
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    id INTEGER PRIMARY KEY, name TEXT, country TEXT, admin1 TEXT,
+    latitude REAL, longitude REAL, population INTEGER, timezone TEXT, source TEXT);
+CREATE TABLE IF NOT EXISTS names (
+    id INTEGER PRIMARY KEY, key TEXT, country TEXT, population INTEGER, place_id INTEGER, alias INTEGER);
+CREATE TABLE IF NOT EXISTS grams (
+    gram TEXT, country TEXT, ids BLOB, PRIMARY KEY (gram, country)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def available() -> bool:
+    return os.path.exists(GAZETTEER_FILE)
+
+
+_local = threading.local()
+
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(GAZETTEER_FILE, timeout=10)
+        conn.execute(f"PRAGMA mmap_size = {GAZETTEER_MMAP_SIZE}")
+        _local.conn = conn
+    return conn
+
+
+# ---------------------------
+# Import
+# ---------------------------
+
+def _dump_lines(path: str):
+    """Text lines of a GeoNames dump, reading the .txt inside a .zip."""
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            member = next(n for n in archive.namelist() if n.endswith(".txt") and "readme" not in n.lower())
+            with archive.open(member) as f:
+                for line in f:
+                    yield line.decode("utf-8")
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield from f
+
+
+def _place_keys(fields: list[str]) -> list[tuple[str, int]]:
+    """(normalized key, is_alias) for a place's name, ASCII name and alternates."""
+    keys = {}
+    for name in (fields[_NAME], fields[_ASCII]):
+        keys.setdefault(normalize(name), 0)
+    for name in fields[_ALTERNATES].split(","):
+        if len(keys) >= MAX_KEYS_PER_PLACE:
+            break
+        keys.setdefault(normalize(name), 1)
+    keys.pop("", None)
+    return list(keys.items())
+
+
+def _write_grams(conn: sqlite3.Connection):
+    """Build the trigram posting lists one country at a time."""
+    postings, current = defaultdict(list), None
+
+    def flush():
+        conn.executemany(
+            "INSERT INTO grams VALUES (?, ?, ?)",
+            ((gram, current, np.asarray(ids, dtype=np.uint32).tobytes()) for gram, ids in postings.items()),
+        )
+        postings.clear()
+
+    for name_id, key, country in conn.execute("SELECT id, key, country FROM names ORDER BY country, id"):
+        if country != current:
+            flush()
+            current = country
+        for gram in trigrams(key):
+            postings[gram].append(name_id)
+    flush()
+
+
+def import_geonames(dump_path: str, output: str = None, min_population: int = 0) -> dict:
+    """
+    Build the gazetteer from a GeoNames dump; returns counts.
+
+    The file is written next to `output` and moved into place when complete,
+    so running workers never see a half-built gazetteer.
+    """
+    output = output or GAZETTEER_FILE
+    tmp = f"{output}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    conn.executescript(_SCHEMA + "CREATE TEMP TABLE raw_names (key TEXT, country TEXT, population INTEGER, "
+                                 "place_id INTEGER, alias INTEGER);")
+
+    places = 0
+    for line in _dump_lines(dump_path):
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) < 19 or fields[_CLASS] not in FEATURE_CLASSES:
+            continue
+        population = int(fields[_POPULATION] or 0)
+        if population < min_population:
+            continue
+        place_id, country = int(fields[_ID]), fields[_COUNTRY]
+        conn.execute(
+            "INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'geonames')",
+            (place_id, fields[_NAME], country, fields[_ADMIN1], float(fields[_LAT]), float(fields[_LON]),
+             population, fields[_TIMEZONE] or None),
+        )
+        conn.executemany(
+            "INSERT INTO raw_names VALUES (?, ?, ?, ?, ?)",
+            ((key, country, population, place_id, alias) for key, alias in _place_keys(fields)),
+        )
+        places += 1
+
+    # ids in population order: ties, prefix scans and trigram counts favour larger places
+    conn.execute(
+        "INSERT INTO names (key, country, population, place_id, alias) "
+        "SELECT key, country, population, place_id, alias FROM raw_names "
+        "ORDER BY population DESC, place_id, alias"
+    )
+    conn.execute("DROP TABLE raw_names")
+    conn.execute("CREATE INDEX names_key ON names (key)")
+    conn.execute("CREATE INDEX names_country_key ON names (country, key)")
+    _write_grams(conn)
+    names = conn.execute("SELECT count(*) FROM names").fetchone()[0]
+    conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ("source", os.path.basename(dump_path)), ("imported_at", str(time.time())),
+        ("places", str(places)), ("names", str(names)),
+    ])
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    os.replace(tmp, output)
+    return {"places": places, "names": names, "bytes": os.path.getsize(output)}
+
+
+def add_place(name: str, country: str, latitude: float, longitude: float, timezone: str | None,
+              source: str) -> int:
+    """Insert one place (e.g. from online geocoding) with its name in every index."""
+    conn = _conn()
+    key = normalize(name)
+    conn.executescript(_SCHEMA)
+    with conn:
+        place_id = conn.execute("SELECT min(coalesce(min(id), 0), 0) - 1 FROM places").fetchone()[0]
+        conn.execute("INSERT INTO places VALUES (?, ?, ?, '', ?, ?, 0, ?, ?)",
+                     (place_id, name, country, latitude, longitude, timezone, source))
+        name_id = conn.execute("INSERT INTO names (key, country, population, place_id, alias) "
+                               "VALUES (?, ?, 0, ?, 0)", (key, country, place_id)).lastrowid
+        for gram in trigrams(key):
+            row = conn.execute("SELECT ids FROM grams WHERE gram = ? AND country = ?", (gram, country)).fetchone()
+            ids = (row[0] if row else b"") + np.uint32(name_id).tobytes()
+            conn.execute("INSERT OR REPLACE INTO grams VALUES (?, ?, ?)", (gram, country, ids))
+    return place_id
+
+
+# ---------------------------
+# Lookup
+# ---------------------------
+
+_PLACE_COLUMNS = "p.name, p.country, p.latitude, p.longitude, p.population, p.timezone, p.admin1"
+
+
+def _place(row) -> dict:
+    """A places row in the geonamescache city layout location_convector expects."""
+    name, country, lat, lon, population, tz, admin1 = row
+    return {"name": name, "countrycode": country, "latitude": lat, "longitude": lon,
+            "population": population, "timezone": tz, "admin1code": admin1}
+
+
+def _country_filter(country: str | None) -> tuple[str, tuple]:
+    return (" AND n.country = ?", (country,)) if country else ("", ())
+
+
+def _exact(key: str, country: str | None):
+    where, args = _country_filter(country)
+    return _conn().execute(
+        f"SELECT {_PLACE_COLUMNS} FROM names n JOIN places p ON p.id = n.place_id "
+        f"WHERE n.key = ?{where} ORDER BY n.alias, n.id LIMIT 1", (key, *args),
+    ).fetchone()
+
+
+def _prefix_ids(key: str, country: str | None, limit: int) -> list[int]:
+    where, args = _country_filter(country)
+    rows = _conn().execute(
+        f"SELECT n.id FROM names n WHERE n.key >= ? AND n.key < ?{where} ORDER BY n.id LIMIT ?",
+        (key, key + "~", *args, limit),
+    )
+    return [name_id for name_id, in rows]
+
+
+def _gram_ids(key: str, country: str | None) -> list[int]:
+    """Ids of the names sharing the most trigrams with key, largest places first on ties."""
+    where, args = (" AND country = ?", (country,)) if country else ("", ())
+    grams = list(trigrams(key))
+    marks = ",".join("?" * len(grams))
+    sizes = _conn().execute(
+        f"SELECT gram, sum(length(ids)) / 4 FROM grams WHERE gram IN ({marks}){where} GROUP BY gram",
+        (*grams, *args),
+    ).fetchall()
+    chosen, total = [], 0
+    for gram, size in sorted(sizes, key=lambda row: row[1]):
+        if chosen and total + size > MAX_POSTINGS:
+            break
+        chosen.append(gram)
+        total += size
+    if not chosen:
+        return []
+
+    marks = ",".join("?" * len(chosen))
+    blobs = _conn().execute(f"SELECT ids FROM grams WHERE gram IN ({marks}){where}", (*chosen, *args))
+    ids = np.concatenate([np.frombuffer(blob, dtype=np.uint32) for blob, in blobs])
+    ids, counts = np.unique(ids, return_counts=True)
+    best = np.lexsort((ids, -counts))[:MAX_CANDIDATES]
+    return ids[best].tolist()
+
+
+def _fuzzy(key: str, country: str | None):
+    candidates = list(dict.fromkeys(_prefix_ids(key, country, PREFIX_CANDIDATES) + _gram_ids(key, country)))
+    if not candidates:
+        return None
+    marks = ",".join("?" * len(candidates))
+    rows = _conn().execute(
+        f"SELECT n.key, {_PLACE_COLUMNS} FROM names n JOIN places p ON p.id = n.place_id "
+        f"WHERE n.id IN ({marks}) ORDER BY n.id", candidates,
+    ).fetchall()
+    best, best_score = None, None
+    for row in rows:
+        score = PREFIX_SCORE if row[0].startswith(key + " ") else fuzz.ratio(key, row[0])
+        if score < GAZETTEER_MIN_SCORE:
+            continue
+        score += POPULATION_WEIGHT * math.log10(row[5] + 1)
+        if best_score is None or score > best_score:  # rows are by id: ties keep the larger place
+            best, best_score = row, score
+    return best[1:] if best else None
+
+
+def lookup(city: str, country: str | None = None) -> dict | None:
+    """
+    Best place for a city name, optionally within one ISO country code.
+
+    Exact name or alias first (canonical names before aliases, then by
+    population), then prefix and fuzzy candidates ranked by similarity and
+    population. None if nothing scores GAZETTEER_MIN_SCORE.
+    """
+    key = normalize(city)
+    if not key:
+        return None
+    with metrics.stage("gazetteer"):
+        row = _exact(key, country)
+        result = "exact"
+        if row is None:
+            row = _fuzzy(key, country)
+            result = "fuzzy" if row else "miss"
+    metrics.inc("gazetteer_lookups_total", result=result)
+    return _place(row) if row else None
+
+
+def suggest(prefix: str, country: str | None = None, limit: int = 10) -> list[dict]:
+    """Places whose name, then alias, starts with prefix, most populous first (autocomplete)."""
+    key = normalize(prefix)
+    if not key:
+        return []
+    where, args = _country_filter(country)
+    rows = _conn().execute(
+        f"SELECT p.id, {_PLACE_COLUMNS} FROM names n JOIN places p ON p.id = n.place_id "
+        f"WHERE n.key >= ? AND n.key < ?{where} ORDER BY n.alias, n.id LIMIT ?",
+        (key, key + "~", *args, limit * 4),
+    )
+    places = {}
+    for place_id, *row in rows:
+        places.setdefault(place_id, _place(row))
+    return list(places.values())[:limit]
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.models.overview_model import OverviewResponse
+from app.models.plan_model import PlanResponse
+from app.services import healing_service, overview_service, translation_service
+from app.services.context_service import build_context
+from app.services.llm_service import LLM_MODEL
+from app.services.sign_house_convector import SIGNS, HOUSES
+
+GENERATION_STORE_FILE = os.getenv("GENERATION_STORE_FILE", "app/vector_db/generations.sqlite")
+SERVE_FROM_STORE = os.getenv("SERVE_FROM_STORE", "false").lower() in ("1", "true", "yes")
+
+KINDS = ("overview", "plan")
+
+log = logging.getLogger(__name__)
+
+
+def store_version() -> str:
+    """
+    Version tag for stored generations.
+
+    Derived from the prompt templates and model so that editing a prompt
+    makes older entries invisible instead of silently serving them.
+    """
+    override = os.getenv("GENERATION_STORE_VERSION")
+    if override:
+        return override
+    digest = hashlib.sha256()
+    for part in (LLM_MODEL,
+                 healing_service.PROMPT_INSTRUCTIONS, healing_service.PROMPT_REQUEST,
+                 overview_service.PROMPT_INSTRUCTIONS, overview_service.PROMPT_REQUEST,
+                 translation_service.TRANSLATION_MODEL, translation_service.TRANSLATE_INSTRUCTIONS):
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+_local = threading.local()
+
+
+def _conn():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(GENERATION_STORE_FILE, timeout=10)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            "kind TEXT, sign TEXT, house TEXT, language TEXT, version TEXT, "
+            "payload TEXT, created_at REAL, "
+            "PRIMARY KEY (kind, sign, house, language, version))"
+        )
+        _local.conn = conn
+    return conn
+
+
+def get(kind: str, sign: str, house: str, language: str) -> dict | None:
+    language = translation_service.canonical_language(language)
+    row = _conn().execute(
+        "SELECT payload FROM generations "
+        "WHERE kind = ? AND sign = ? AND house = ? AND language = ? AND version = ?",
+        (kind, sign, house, language, store_version()),
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def put(kind: str, sign: str, house: str, language: str, payload: dict):
+    language = translation_service.canonical_language(language)
+    conn = _conn()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO generations VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, sign, house, language, store_version(), json.dumps(payload), time.time()),
+        )
+
+
+async def _generate(kind: str, sign: str, house: str, language: str) -> dict | None:
+    """Payload for one placement, generated for the canonical language; partial answers are not stored."""
+    context = await build_context(sign, house)
+    if kind == "overview":
+        overview = await overview_service.generate_overview(context, sign, house, language, complete_only=True)
+        if not overview:
+            return None
+        return OverviewResponse(sign=sign, house=house, **overview).model_dump()
+
+    plan_list = await healing_service.generate_healing_plan(context, sign, house, language, complete_only=True)
+    if not plan_list:
+        return None
+    return PlanResponse(plan=plan_list).model_dump()
+
+
+async def _translate(kind: str, sign: str, house: str, language: str) -> dict | None:
+    """The stored canonical payload translated into language (sign/house stay as keys)."""
+    canonical = get(kind, sign, house, translation_service.CANONICAL_LANGUAGE)
+    if canonical is None:
+        return None
+    return await translation_service.translate(canonical, language, keep=("sign", "house"))
+
+
+async def precompute(languages: list[str], kinds=KINDS, max_workers: int = 4, force: bool = False) -> dict:
+    """
+    Generate and store every sign x house entry that is not stored yet.
+
+    Each placement is generated once in the canonical language; other
+    languages are translated from the stored canonical entry. At most
+    max_workers LLM calls are in flight at once so the OpenAI rate limit is
+    respected. Returns counts of generated, skipped and failed entries.
+    """
+    canonical = translation_service.CANONICAL_LANGUAGE
+    languages = list(dict.fromkeys(map(translation_service.canonical_language, languages)))
+    jobs = [
+        (kind, sign, house, language)
+        for language in languages
+        for kind in kinds
+        for sign in SIGNS
+        for house in HOUSES
+    ]
+    if not force:
+        jobs = [job for job in jobs if get(*job) is None]
+    # Canonical entries first: every translation job needs one.
+    placements = {job[:3] for job in jobs}
+    base_jobs = [placement + (canonical,) for placement in sorted(placements)
+                 if force or get(*placement, canonical) is None]
+    translation_jobs = [job for job in jobs if job[3] != canonical]
+
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def run(job, make):
+        async with semaphore:
+            payload = await make(*job)
+        if payload is None:
+            log.warning("Precompute failed: %s", job)
+            return False
+        put(*job, payload)
+        return True
+
+    base = await asyncio.gather(*(run(job, _generate) for job in base_jobs))
+    results = await asyncio.gather(*(run(job, _translate) for job in translation_jobs))
+    # Count each requested canonical-language entry once
+    results = [ok for job, ok in zip(base_jobs, base) if job in jobs] + list(results)
+
+    total = len(languages) * len(kinds) * len(SIGNS) * len(HOUSES)
+    return {
+        "generated": sum(results),
+        "failed": len(results) - sum(results),
+        "skipped": total - len(jobs),
+    }
@@ -1,7 +1,13 @@
-from app.services.llm_service import query_llm_plan
+from app.services.json_stream import replay_events
+from app.services.llm_service import query_llm_plan, stream_llm_plan
+from app.services.prompt_builder import PromptBuilder
+from app.services.translation_service import CANONICAL_LANGUAGE, is_canonical, translate
 
-PROMPT_TEMPLATE = """
-You are a healing guide. Based on Chiron in House {house} and Sign {sign}, 
+# Bump when the prompt text or layout changes meaning; it is part of the LLM cache key.
+PROMPT_VERSION = "plan-v3"
+
+PROMPT_INSTRUCTIONS = """
+You are a healing guide. Based on the Chiron placement (House and Sign) given at the end, 
 identify the main wound points for this placement and create a **day-by-day healing plan**.
 
 Important Instruction:
@@ -10,18 +16,15 @@ Important Instruction:
 - The data provided in the context is separated by Sign and House, but you must **synthesize and combine both dimensions** to create a unified interpretation.  
 - Each day’s plan should clearly reflect both the *sign’s wound style* and the *house’s life domain*, producing integrated insights rather than treating them separately.  
 
-Output must be in **valid JSON array** format only.
+Output must be a **valid JSON object** of the form {"plan": [...]} and nothing else.
 
-Each item in the array represents one day and must include:
+Each item in the "plan" array represents one day and must include:
 - "overview": (string, detailed explanation of the healing focus: what the wound is, why healing is needed, and the benefit of this day’s practice 50 words)
 - "activity": (string, title of the main activity)
 - "prompts": (array of unique journaling prompts, no duplicates in each day)
 - "meditation": (string, title of a meditation practice)
 - "affirmation": (short setence that is a positive affirmation that helps release or rewire negative wound patterns, transforming them into empowering and positive beliefs)
 
-Context:
-{context}
-
 Notes for writing:
 - Always merge both Sign (pattern/nature of wound) and House (life area impacted) into a single cohesive explanation (50 words).  
 - For "overview": Provide a deep, reflective summary that connects the wound to the day’s healing focus.  
@@ -31,19 +34,56 @@ Notes for writing:
 - Ensure the JSON is valid and remove duplicate prompts.
 """
 
-def generate_healing_plan(context: str, sign: str, house: str):
-    prompt = PROMPT_TEMPLATE.format(context=context, sign=sign, house=house)
-    data = query_llm_plan(prompt)
+# Variable part, appended after the static instructions.
+PROMPT_REQUEST = """
+Placement: Chiron in House {house} and Sign {sign}
+
+Context:
+{context}
+"""
+
+PROMPT = PromptBuilder("plan", PROMPT_INSTRUCTIONS, PROMPT_REQUEST)
+
+
+def _plan_day(item: dict) -> dict:
+    return {
+        "overview": item.get("overview", ""),
+        "activity": item.get("activity", ""),
+        "prompts": item.get("prompts", []),
+        "meditation": item.get("meditation", ""),
+        "affirmation": item.get("affirmation", "")
+    }
+
+
+async def generate_healing_plan(context: list[str], sign: str, house: str, language: str = CANONICAL_LANGUAGE,
+                                complete_only: bool = False):
+    """
+    The canonical (English) plan for the placement, translated into language.
+    With complete_only a plan still missing days is None instead.
+    """
+    prompt = PROMPT.build(context, sign=sign, house=house).text
+    data = await query_llm_plan(prompt, prompt_version=PROMPT_VERSION, complete_only=complete_only)
     if not data:
         return None
 
-    return [
-        {
-            "overview": item.get("overview", ""),
-            "activity": item.get("activity", ""),
-            "prompts": item.get("prompts", []),
-            "meditation": item.get("meditation", ""),
-            "affirmation": item.get("affirmation", "")
-        }
-        for item in data
-    ]
+    return await translate([_plan_day(item) for item in data], language)
+
+
+async def stream_healing_plan(context: list[str], sign: str, house: str, language: str = CANONICAL_LANGUAGE):
+    """
+    Yield ("item", day) as soon as each plan day closes in the LLM stream,
+    then ("end", plan); without "end" the plan could not be generated.
+    Other languages are translated from the complete canonical plan.
+    """
+    if not is_canonical(language):
+        plan = await generate_healing_plan(context, sign, house, language)
+        for event in replay_events(plan) if plan else []:
+            yield event
+        return
+
+    prompt = PROMPT.build(context, sign=sign, house=house).text
+    async for event in stream_llm_plan(prompt, prompt_version=PROMPT_VERSION):
+        if event[0] == "item" and isinstance(event[1], dict):
+            yield "item", _plan_day(event[1])
+        elif event[0] == "end":
+            yield "end", [_plan_day(item) for item in event[1]]
@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from app.services import lexical_index, vector_store
+from app.services.ann_index import INDEX_TYPE, build_faiss_index
+from app.services.embedding_service import EMBED_MODEL, embed_chunks
+from app.services.pdf_service import batched, stream_chunks
+
+CHECKPOINT_FILE = os.getenv("INGEST_CHECKPOINT_FILE", "app/vector_db/ingest_checkpoint.sqlite")
+# Upper bound on estimated tokens per embeddings request (the API allows 300k).
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "100000"))
+EMBED_BATCH_SIZE = 2048
+EMBED_RETRIES = 5
+CHUNK_METHODS = ("words", "sections")
+
+log = logging.getLogger(__name__)
+
+
+def chunk_hash(chunk: str) -> str:
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    # English averages ~4 characters per token; 3 keeps batches on the safe side.
+    return len(text) // 3 + 1
+
+
+def token_batches(chunks: list[str], max_tokens: int = None, max_size: int = EMBED_BATCH_SIZE):
+    """Split chunks into consecutive batches under max_tokens and max_size."""
+    max_tokens = max_tokens or EMBED_BATCH_TOKENS
+    batch, tokens = [], 0
+    for chunk in chunks:
+        cost = estimate_tokens(chunk)
+        if batch and (tokens + cost > max_tokens or len(batch) >= max_size):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(chunk)
+        tokens += cost
+    if batch:
+        yield batch
+
+
+def _embed_with_retry(batch: list[str]) -> np.ndarray:
+    for attempt in range(EMBED_RETRIES):
+        try:
+            return embed_chunks(batch)
+        except Exception as e:
+            if attempt == EMBED_RETRIES - 1:
+                raise
+            delay = 2 ** attempt
+            log.warning("Embedding batch failed (%s); retrying in %ss", e, delay)
+            time.sleep(delay)
+
+
+class _Checkpoint:
+    """Embeddings finished by an interrupted run, keyed by (model, chunk hash)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (model TEXT, hash TEXT, vector BLOB, "
+            "PRIMARY KEY (model, hash))"
+        )
+
+    def get(self, model: str, hashes: list[str]) -> dict:
+        """hash -> embedding for those of hashes that are checkpointed."""
+        found = {}
+        for start in range(0, len(hashes), 500):  # stay under SQLite's bound-parameter limit
+            part = hashes[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(part))})",
+                [model, *part],
+            )
+            found.update((h, np.frombuffer(v, dtype=np.float32)) for h, v in rows)
+        return found
+
+    def save(self, model: str, hashes: list[str], vectors: np.ndarray):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [(model, h, v.astype(np.float32).tobytes()) for h, v in zip(hashes, vectors)],
+            )
+
+    def remove(self):
+        self.conn.close()
+        os.remove(self.path)
+
+
+def _stored_embeddings(model: str) -> tuple[dict, np.ndarray | None]:
+    """
+    (chunk hash -> row, memory-mapped embeddings) of the current store
+    version, if it used this model; the vectors themselves stay on disk.
+    """
+    version = vector_store.current_version()
+    if version is None or vector_store.read_manifest(version).get("embedding_model") != model:
+        return {}, None
+    chunks = vector_store.open_chunks(version)
+    return {chunk_hash(chunk): i for i, chunk in enumerate(chunks)}, vector_store.open_embeddings(version)
+
+
+def ingest(pdf_paths: list[str], max_len: int = 200, overlap: int = 0, force: bool = False,
+           workers: int = None, method: str = "words", index_type: str = None,
+           index_params: dict = None) -> dict:
+    """
+    Re-index pdf_paths, embedding only chunks whose content hash is new.
+
+    Pages are extracted on a process pool and chunked as they stream in;
+    chunks are handled EMBED_BATCH_SIZE at a time and written straight to a
+    new store version. Embeddings are reused from the current store version
+    (memory-mapped) and from the checkpoint, which holds those of an
+    interrupted run and every one embedded so far; both are looked up batch
+    by batch. Memory therefore stays flat regardless of corpus size, except
+    for a hash -> row index of the current version (one short string per
+    chunk). method="sections" splits chunks at the sign/house headings and
+    tags them for direct lookup. The FAISS index (index_type, default
+    INDEX_TYPE) is built and trained from the finished embeddings file.
+    Returns counts of reused and embedded chunks
+    and the version.
+    """
+    if method not in CHUNK_METHODS:
+        raise ValueError(f"Unknown chunking method {method!r}; expected one of {CHUNK_METHODS}")
+    index_type = index_type or INDEX_TYPE
+    index_params = index_params or {}
+    sources = [{"path": path, "sha256": vector_store.file_sha256(path)} for path in pdf_paths]
+    chunking = {"method": method, "max_len": max_len, "overlap": overlap}
+    version = vector_store.current_version()
+    if version and not force:
+        manifest = vector_store.read_manifest(version)
+        if (manifest.get("sources") == sources
+                and manifest.get("chunking") == chunking
+                and manifest.get("embedding_model") == EMBED_MODEL
+                and manifest.get("index", {}).get("type") == index_type
+                and manifest.get("lexical", {}).get("format") == lexical_index.FORMAT
+                and not index_params):
+            return {"version": version, "reused": manifest["count"], "embedded": 0, "unchanged": True}
+
+    checkpoint = _Checkpoint(CHECKPOINT_FILE)
+    stored_rows, stored = _stored_embeddings(EMBED_MODEL)
+    writer = vector_store.VersionWriter({
+        "sources": sources,
+        "chunking": chunking,
+        "embedding_model": EMBED_MODEL,
+    })
+    reused = embedded = 0
+    try:
+        for batch in batched(stream_chunks(pdf_paths, max_len, overlap, workers, sections=method == "sections"), EMBED_BATCH_SIZE):
+            hashes = [chunk_hash(chunk.text) for chunk in batch]
+            known = {h: stored[stored_rows[h]] for h in hashes if h in stored_rows}
+            known.update(checkpoint.get(EMBED_MODEL, list({h for h in hashes if h not in known})))
+            reused += sum(1 for h in hashes if h in known)
+
+            missing = {}
+            for chunk, h in zip(batch, hashes):
+                if h not in known:
+                    missing.setdefault(h, chunk.text)
+            for texts in token_batches(list(missing.values())):
+                vectors = _embed_with_retry(texts)
+                text_hashes = [chunk_hash(text) for text in texts]
+                checkpoint.save(EMBED_MODEL, text_hashes, vectors)
+                known.update(zip(text_hashes, vectors))
+                embedded += len(texts)
+
+            embeddings = np.stack([known[h] for h in hashes]).astype(np.float32)
+            writer.add([chunk.text for chunk in batch], embeddings,
+                       [(chunk.document, chunk.page, chunk.offset) for chunk in batch],
+                       [{"sign": chunk.sign, "house": chunk.house} for chunk in batch])
+        if not len(writer):
+            raise ValueError(f"No text found in {pdf_paths}")
+        new_version = writer.commit(
+            index_builder=lambda stored: build_faiss_index(stored, index_type, **index_params))
+    except BaseException:
+        writer.abort()
+        raise
+    checkpoint.remove()
+    return {"version": new_version, "reused": reused, "embedded": embedded, "unchanged": False}
@@ -0,0 +1,233 @@
+import json
+
+
+class JSONStreamParser:
+    """
+    Incremental scanner for the first JSON array or object in LLM output.
+
+    Text is fed in as it streams. feed() returns the events completed by the
+    new text, in order:
+
+    - ("item", value) for each element of a top-level array
+    - ("field", key, value) for each member of a top-level object
+    - ("end", value) once the top-level value closes
+
+    Anything before the first root character (prose, ```json fences) is
+    skipped, and brackets inside strings are ignored. If the closed value is
+    not valid JSON as a whole (e.g. a trailing comma), "end" carries the
+    members that did parse.
+    """
+
+    def __init__(self, root: str = "[{"):
+        self.root = root
+        self.text = ""
+        self.kind = None
+        self.done = False
+        self.value = None
+        self.raw = None
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = 0
+        self._member_emitted = False
+        self._collected = None
+
+    def feed(self, chunk: str) -> list:
+        events = []
+        if self.done or not chunk:
+            return events
+
+        if self.kind is None:
+            starts = [chunk.find(c) for c in self.root if c in chunk]
+            if not starts:
+                return events
+            chunk = chunk[min(starts):]
+            self.kind = chunk[0]
+            self._collected = [] if self.kind == "[" else {}
+
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+                if self._depth == 1:
+                    self._start_member(i + 1)
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._close_member(text[self._member_start:i], events)
+                    self._finish(text[:i + 1], events)
+                    break
+                if self._depth == 1:
+                    # A nested container just closed; its member is complete.
+                    self._close_member(text[self._member_start:i + 1], events)
+            elif ch == "," and self._depth == 1:
+                self._close_member(text[self._member_start:i], events)
+                self._start_member(i + 1)
+        self._pos = len(text)
+        return events
+
+    def _start_member(self, pos: int):
+        self._member_start = pos
+        self._member_emitted = False
+
+    def _close_member(self, segment: str, events: list):
+        segment = segment.strip()
+        if self._member_emitted or not segment:
+            return
+        try:
+            if self.kind == "[":
+                value = json.loads(segment)
+                self._collected.append(value)
+                events.append(("item", value))
+            else:
+                ((key, value),) = json.loads("{" + segment + "}").items()
+                self._collected[key] = value
+                events.append(("field", key, value))
+        except (json.JSONDecodeError, ValueError):
+            return
+        self._member_emitted = True
+
+    def _finish(self, raw: str, events: list):
+        self.done = True
+        self.raw = raw
+        try:
+            self.value = json.loads(raw)
+        except json.JSONDecodeError:
+            self.value = self._collected
+        events.append(("end", self.value))
+
+
+def extract_json_text(text: str, root: str = "[{") -> str | None:
+    """Return the raw text of the first complete JSON value starting with a root character."""
+    parser = JSONStreamParser(root)
+    parser.feed(text)
+    return parser.raw
+
+
+def replay_events(value) -> list:
+    """Events a parser would have produced for an already parsed value."""
+    if isinstance(value, list):
+        events = [("item", item) for item in value]
+    else:
+        events = [("field", key, item) for key, item in value.items()]
+    return events + [("end", value)]
+
+
+def _scan(text: str):
+    """
+    String-aware pass over text. Returns (in_string, open brackets, cut points)
+    where cut points are (position, open brackets there) just before each
+    comma and just after each opening bracket: places where the text can be
+    cut and still close into valid JSON.
+    """
+    stack, cuts = [], []
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "[{":
+            stack.append(ch)
+            cuts.append((i + 1, tuple(stack)))
+        elif ch in "]}":
+            if stack:
+                stack.pop()
+        elif ch == ",":
+            cuts.append((i, tuple(stack)))
+    return in_string, stack, cuts
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Remove commas directly before a closing bracket, outside strings."""
+    out = []
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "]}":
+            # drop a trailing comma (and the whitespace after it)
+            j = len(out) - 1
+            while j >= 0 and out[j].isspace():
+                j -= 1
+            if j >= 0 and out[j] == ",":
+                del out[j:]
+        out.append(ch)
+    return "".join(out)
+
+
+def _close(text: str, stack) -> str:
+    return text + "".join("]" if opener == "[" else "}" for opener in reversed(stack))
+
+
+def repair_json(text: str, root: str = "[{"):
+    """
+    Parse the first JSON value in LLM output, repairing common defects.
+
+    Handles prose or ```json fences around the value, trailing commas, and
+    output cut off mid-value: the text is cut back to the last complete
+    member (a half-written string is dropped) and open brackets are closed.
+    Returns (value, repairs) with repairs a list of the fixes applied
+    ("extracted", "trailing_commas", "truncated"), or (None, repairs) if
+    nothing could be recovered.
+    """
+    repairs = []
+    if not text:
+        return None, repairs
+    try:
+        return json.loads(text), repairs
+    except json.JSONDecodeError:
+        pass
+
+    starts = [text.find(c) for c in root if c in text]
+    if not starts:
+        return None, repairs
+    body = text[min(starts):]
+    raw = extract_json_text(body, root)
+    if raw is not None:
+        if raw.strip() != text.strip():
+            repairs.append("extracted")
+        try:
+            return json.loads(raw), repairs
+        except json.JSONDecodeError:
+            fixed = _strip_trailing_commas(raw)
+            try:
+                return json.loads(fixed), repairs + ["trailing_commas"]
+            except json.JSONDecodeError:
+                return None, repairs
+
+    # Never closed: truncated output.
+    repairs.append("truncated")
+    in_string, stack, cuts = _scan(body)
+    candidates = [] if in_string else [(body, stack)]
+    candidates += [(body[:pos], list(open_at)) for pos, open_at in reversed(cuts)]
+    for candidate, open_stack in candidates:
+        try:
+            return json.loads(_strip_trailing_commas(_close(candidate.rstrip(), open_stack))), repairs
+        except json.JSONDecodeError:
+            continue
+    return None, repairs
@@ -0,0 +1,40 @@
+import threading
+import time
+
+_UNSET = object()
+
+
+class Lazy:
+    """
+    Thread-safe holder that builds an expensive object on first get().
+
+    Every instance is registered so a warm-up step can build them all up
+    front (e.g. in the gunicorn master before workers fork) and report how
+    long each one took.
+    """
+
+    registry = []
+
+    def __init__(self, name: str, factory, preload: bool = True):
+        self.name = name
+        self.factory = factory
+        self.preload = preload
+        self.init_seconds = None
+        self._value = _UNSET
+        self._lock = threading.Lock()
+        Lazy.registry.append(self)
+
+    def get(self):
+        value = self._value
+        if value is _UNSET:
+            with self._lock:
+                if self._value is _UNSET:
+                    start = time.perf_counter()
+                    self._value = self.factory()
+                    self.init_seconds = time.perf_counter() - start
+                value = self._value
+        return value
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not _UNSET
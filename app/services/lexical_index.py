@@ -0,0 +1,115 @@
+"""
+BM25 inverted index over the store's chunks.
+
+Built alongside the embeddings while a store version is written and saved
+in the same version directory:
+  lexical_terms.json      sorted vocabulary
+  lexical_offsets.npy     int64 (terms + 1) start of each term's postings
+  lexical_postings.npy    (chunk int32, tf int32) rows grouped by term
+  lexical_doclen.npy      int32 token count per chunk
+The arrays are memory-mapped on load; a query touches only the postings of
+its own terms, so search is a few NumPy ops and needs no network call.
+"""
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from app.services.place_index import normalize
+
+FORMAT = "bm25-v1"
+K1 = 1.5
+B = 0.75
+
+POSTING_DTYPE = np.dtype([("chunk", np.int32), ("tf", np.int32)])
+
+_camel = re.compile(r"([a-z])([A-Z])")
+STOPWORDS = frozenset(
+    "a an and are as at be been by for from has have i in is it its me my of on or so "
+    "that the this to was were what when with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """'Chiron in AriesHouse, Prompt' -> ['chiron', 'aries', 'house', 'prompt']."""
+    # Split glued words ('AriesHouse', 'coreWounds') before folding case.
+    return [t for t in normalize(_camel.sub(r"\1 \2", text)).split() if t not in STOPWORDS]
+
+
+class LexicalIndexBuilder:
+    """Accumulates postings chunk by chunk; save() writes the index files."""
+
+    def __init__(self):
+        self.postings = {}
+        self.doclen = []
+
+    def add(self, text: str):
+        """Add the next chunk (ids follow insertion order)."""
+        chunk_id = len(self.doclen)
+        tokens = tokenize(text)
+        self.doclen.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, []).append((chunk_id, tf))
+
+    def save(self, directory: str) -> dict:
+        terms = sorted(self.postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(self.postings[t]) for t in terms])
+        postings = np.empty(int(offsets[-1]), dtype=POSTING_DTYPE)
+        for term, start in zip(terms, offsets):
+            rows = self.postings[term]
+            postings[start:start + len(rows)] = rows
+
+        with open(os.path.join(directory, "lexical_terms.json"), "w") as f:
+            json.dump(terms, f)
+        np.save(os.path.join(directory, "lexical_offsets.npy"), offsets)
+        np.save(os.path.join(directory, "lexical_postings.npy"), postings)
+        np.save(os.path.join(directory, "lexical_doclen.npy"), np.array(self.doclen, dtype=np.int32))
+        return {"format": FORMAT, "terms": len(terms), "k1": K1, "b": B}
+
+
+class LexicalIndex:
+    """Read-only BM25 index loaded from a version directory."""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "lexical_terms.json")) as f:
+            self.terms = {term: i for i, term in enumerate(json.load(f))}
+        self.offsets = np.load(os.path.join(directory, "lexical_offsets.npy"), mmap_mode="r")
+        self.postings = np.load(os.path.join(directory, "lexical_postings.npy"), mmap_mode="r")
+        self.doclen = np.load(os.path.join(directory, "lexical_doclen.npy")).astype(np.float32)
+        self.avgdl = float(self.doclen.mean()) if len(self.doclen) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.doclen)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for query."""
+        n = len(self.doclen)
+        scores = np.zeros(n, dtype=np.float32)
+        norm = K1 * (1 - B + B * self.doclen / (self.avgdl or 1.0))
+        for term in set(tokenize(query)):
+            i = self.terms.get(term)
+            if i is None:
+                continue
+            rows = self.postings[self.offsets[i]:self.offsets[i + 1]]
+            df = len(rows)
+            idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+            chunk, tf = rows["chunk"], rows["tf"].astype(np.float32)
+            scores[chunk] += idf * tf * (K1 + 1) / (tf + norm[chunk])
+        return scores
+
+    def search(self, query: str, top_k: int = 5, candidates: list[int] = None) -> list[int]:
+        """Ids of the top_k chunks (restricted to candidates, if given) with a positive score."""
+        scores = self.scores(query)
+        ids = np.arange(len(scores)) if candidates is None else np.asarray(candidates, dtype=np.int64)
+        ranked = ids[np.argsort(-scores[ids], kind="stable")][:top_k]
+        return [int(i) for i in ranked if scores[i] > 0]
+
+
+def open_index(directory: str) -> LexicalIndex | None:
+    """The index in directory, or None for versions written before it existed."""
+    if not os.path.exists(os.path.join(directory, "lexical_terms.json")):
+        return None
+    return LexicalIndex(directory)
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+# Optional on-disk tier shared by all gunicorn workers, e.g.
+# app/vector_db/llm_cache.sqlite (git-ignored with the other caches there);
+# empty disables it.
+LLM_CACHE_FILE = os.getenv("LLM_CACHE_FILE", "")
+LLM_CACHE_DISK_MAX = int(os.getenv("LLM_CACHE_DISK_MAX", "10000"))
+
+
+def cache_key(model: str, temperature: float, prompt_version: str, prompt: str) -> str:
+    raw = json.dumps([model, temperature, prompt_version, prompt])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of parsed LLM responses.
+
+    The memory tier is an LRU bounded by maxsize; the optional SQLite tier is
+    bounded by disk_max rows. Both expire entries after ttl seconds.
+    """
+
+    def __init__(self, maxsize: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL,
+                 path: str = LLM_CACHE_FILE, disk_max: int = LLM_CACHE_DISK_MAX):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.disk_max = disk_max
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _remember(self, key: str, value, expires_at: float):
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+        if self.path:
+            row = self._conn().execute(
+                "SELECT value, expires_at FROM llm_responses WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                self._count("disk_hits")
+                return value
+
+        self._count("misses")
+        return None
+
+    def put(self, key: str, value):
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        self._count("stores")
+        if not self.path:
+            return
+
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            conn.execute("DELETE FROM llm_responses WHERE expires_at <= ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM llm_responses WHERE key NOT IN ("
+                "SELECT key FROM llm_responses ORDER BY expires_at DESC LIMIT ?)",
+                (self.disk_max,),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+llm_cache = LLMResponseCache()
@@ -1,91 +1,364 @@
 import os
 import json
-import re
-from openai import OpenAI
+import logging
+import random
 from dotenv import load_dotenv
 
+from app.services.executor import run_blocking
+from app.models.overview_model import OverviewContent
+from app.models.plan_model import PlanContent, PlanDay
+from app.services import metrics, structured_output
+from app.services.json_stream import JSONStreamParser, extract_json_text, repair_json, replay_events
+from app.services.llm_cache import llm_cache, cache_key
+from app.services.openai_clients import OPENAI_CHAT_TIMEOUT, UpstreamUnavailable, async_client, call
+
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+# Fraction of raw completions logged (at DEBUG level)
+LLM_LOG_SAMPLE_RATE = float(os.getenv("LLM_LOG_SAMPLE_RATE", "0.01"))
+
+log = logging.getLogger(__name__)
 
 
 def clean_json_response(text: str) -> str:
     """Extract the first valid JSON array or object from the response text."""
-    text = re.sub(r"```json", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"```", "", text)
-
-    # Look for array
-    if "[" in text:
-        start = text.find("[")
-        depth = 0
-        for i, ch in enumerate(text[start:], start=start):
-            if ch == "[":
-                depth += 1
-            elif ch == "]":
-                depth -= 1
-                if depth == 0:
-                    return text[start:i + 1]
-
-    # Look for object
-    if "{" in text:
-        start = text.find("{")
-        depth = 0
-        for i, ch in enumerate(text[start:], start=start):
-            if ch == "{":
-                depth += 1
-            elif ch == "}":
-                depth -= 1
-                if depth == 0:
-                    return text[start:i + 1]
-
-    return None
-
-
-
-def query_llm_plan(prompt: str, temperature: float = 0.3):
-    try:
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature
+    return extract_json_text(text, root="[") or extract_json_text(text, root="{")
+
+
+def _log_usage(usage):
+    """Count the provider's prompt, cached-prefix and completion tokens."""
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) or 0
+    metrics.inc("llm_tokens_total", usage.prompt_tokens, kind="prompt")
+    metrics.inc("llm_tokens_total", cached, kind="cached")
+    metrics.inc("llm_tokens_total", usage.completion_tokens, kind="completion")
+    log.debug("LLM usage: prompt %s tokens (%s cached), completion %s",
+              usage.prompt_tokens, cached, usage.completion_tokens)
+
+
+def _log_raw(content: str):
+    """Log a sample of raw completions; formatting is skipped unless DEBUG is on."""
+    if log.isEnabledFor(logging.DEBUG) and random.random() < LLM_LOG_SAMPLE_RATE:
+        log.debug("LLM raw response: %s", content)
+
+
+def _repair(content: str, root: str):
+    """repair_json, timed as the parse stage and counted in structured_output."""
+    with metrics.stage("parse"):
+        value, repairs = repair_json(content, root=root)
+    structured_output.record(value, repairs)
+    return value, repairs
+
+
+async def _create(messages: list[dict], temperature: float, schema=None, model: str = None, **kwargs):
+    fmt = structured_output.response_format(schema)
+    if fmt is not None:
+        kwargs["response_format"] = fmt
+    with metrics.stage("llm"):
+        # A stream cannot be hedged; retries only cover opening it.
+        return await call(
+            "chat",
+            lambda timeout: async_client().chat.completions.create(
+                model=model or LLM_MODEL,
+                messages=messages,
+                temperature=temperature,
+                timeout=timeout,
+                **kwargs
+            ),
+            timeout=OPENAI_CHAT_TIMEOUT,
+            hedge=False if kwargs.get("stream") else None,
         )
-        content = response.choices[0].message.content.strip()
-        print("LLM raw response:::", content)
 
-        clean_content = clean_json_response(content)
-        if not clean_content:
-            return None
 
-        # Load only the cleaned JSON
-        return json.loads(clean_content)
+async def _cached_completion(prompt: str, temperature: float, prompt_version: str, schema, parse,
+                             model: str = None, complete_only: bool = False):
+    """
+    Return the result of await parse(messages, raw content, temperature) for
+    the prompt, from the response cache if possible.
 
-    except json.JSONDecodeError as e:
-        print("JSON decode error:", e)
-        return None
+    The request asks for schema through response_format (see
+    structured_output). parse returns (result, complete) and only complete
+    results are cached; a partial one (e.g. fields still missing after the
+    follow-up) is returned uncached, or as None with complete_only. Errors
+    and unparseable content return None and leave the cache untouched.
+    UpstreamUnavailable (OpenAI failing or the circuit open) is raised.
+    """
+    key = cache_key(model or LLM_MODEL, temperature, prompt_version, prompt)
+    cached = await run_blocking(llm_cache.get, key)
+    if cached is not None:
+        return cached
+
+    messages = [{"role": "user", "content": prompt}]
+    try:
+        response = await _create(messages, temperature, schema, model)
+        content = (response.choices[0].message.content or "").strip()
+        _log_raw(content)
+        _log_usage(getattr(response, "usage", None))
+
+        data, complete = await parse(messages, content, temperature)
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
-        print("LLM query error:", e)
+        log.warning("LLM query error: %s", e)
         return None
-    
-def query_llm_overview(prompt: str, temperature: float = 0.3):
+
+    if not data:
+        return None
+    if complete:
+        await run_blocking(llm_cache.put, key, data)
+    elif complete_only:
+        return None
+    return data
+
+
+async def _followup(messages: list[dict], answer, instruction: str, temperature: float, schema):
+    """
+    Ask for just the missing part of an answer, continuing the conversation
+    from the (repaired) answer. Returns the parsed JSON object or None, and
+    whether the reply was complete (not cut off).
+    """
+    structured_output.counters["followups"] += 1
+    messages = messages + [
+        {"role": "assistant", "content": json.dumps(answer, ensure_ascii=False)},
+        {"role": "user", "content": instruction},
+    ]
     try:
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature
+        response = await _create(messages, temperature, schema)
+    except Exception as e:
+        # The partial answer is still worth returning.
+        log.warning("LLM follow-up error: %s", e)
+        structured_output.counters["followup_failures"] += 1
+        return None, False
+    content = (response.choices[0].message.content or "").strip()
+    _log_usage(getattr(response, "usage", None))
+    _log_raw(content)
+    value, repairs = _repair(content, root="{")
+    if not isinstance(value, dict):
+        structured_output.counters["followup_failures"] += 1
+        return None, False
+    return value, "truncated" not in repairs
+
+
+def _valid_day(day) -> dict | None:
+    valid = structured_output.valid_items([day], PlanDay)
+    return valid[0] if valid else None
+
+
+async def _parse_plan(messages: list[dict], content: str, temperature: float):
+    """
+    Valid plan days from {"plan": [...]} or a bare array, and whether the
+    plan is complete.
+
+    Days that are present but invalid are re-requested once by day number
+    and replaced in place. Only if the answer was cut off are the days after
+    the last complete one requested, once, and appended. The plan is
+    complete when no day is left invalid and nothing is left cut off.
+    """
+    value, repairs = _repair(content, root="{[")
+    days = value.get("plan") if isinstance(value, dict) else value
+    if not isinstance(days, list):
+        return None, False
+    truncated = "truncated" in repairs
+    checked = [_valid_day(day) for day in days]
+    if truncated and checked and checked[-1] is None:
+        checked.pop()  # the day the cut went through
+    if not any(checked):
+        return None, False
+
+    invalid = [i for i, day in enumerate(checked) if day is None]
+    if invalid and structured_output.LLM_FOLLOWUP:
+        more, _ = await _followup(
+            messages, {"plan": days[:len(checked)]},
+            "Days " + ", ".join(str(i + 1) for i in invalid) + " above are incomplete or invalid. "
+            'Reply with a JSON object {"plan": [...]} containing only corrected versions of these days, '
+            "in this order.",
+            temperature, PlanContent,
         )
-        clean_content = response.choices[0].message.content.strip()
-        print("LLM raw response:::", clean_content)
+        if more and isinstance(more.get("plan"), list):
+            for i, day in zip(invalid, more["plan"]):
+                checked[i] = _valid_day(day)
 
-        
-        if not clean_content:
-            return None
+    valid = [day for day in checked if day]
+    complete = len(valid) == len(checked) and not truncated
+    if truncated and structured_output.LLM_FOLLOWUP:
+        more, more_complete = await _followup(
+            messages, {"plan": valid},
+            f"Only the {len(valid)} days above are complete. Reply with a JSON object "
+            '{"plan": [...]} containing only the remaining days.',
+            temperature, PlanContent,
+        )
+        if more and isinstance(more.get("plan"), list):
+            remaining = structured_output.valid_items(more["plan"], PlanDay)
+            complete = len(valid) == len(checked) and more_complete and len(remaining) == len(more["plan"])
+            valid += remaining
+    return valid, complete
 
-        # Load only the cleaned JSON
-        return json.loads(clean_content)
 
-    except json.JSONDecodeError as e:
-        print("JSON decode error:", e)
-        return None
+async def _parse_overview(messages: list[dict], content: str, temperature: float):
+    """
+    Valid overview fields, and whether all of them are there; missing or
+    invalid ones are re-requested once if the rest parsed.
+    """
+    value, repairs = _repair(content, root="{")
+    if not isinstance(value, dict):
+        return None, False
+    valid, missing = structured_output.split_valid(value, OverviewContent)
+
+    if missing and valid and structured_output.LLM_FOLLOWUP:
+        schema = structured_output.subset_model(OverviewContent, missing)
+        more, _ = await _followup(
+            messages, valid,
+            "The JSON above is missing or has invalid values for: " + ", ".join(missing)
+            + ". Reply with a JSON object containing only these fields, following the original instructions.",
+            temperature, schema,
+        )
+        if more:
+            valid.update(structured_output.split_valid(more, schema)[0])
+    complete = all(field in valid for field in OverviewContent.model_fields)
+    return valid or None, complete
+
+
+async def query_llm_plan(prompt: str, temperature: float = 0.3, prompt_version: str = "",
+                         complete_only: bool = False):
+    return await _cached_completion(prompt, temperature, prompt_version, PlanContent, _parse_plan,
+                                    complete_only=complete_only)
+
+
+async def query_llm_overview(prompt: str, temperature: float = 0.3, prompt_version: str = "",
+                             complete_only: bool = False):
+    return await _cached_completion(prompt, temperature, prompt_version, OverviewContent, _parse_overview,
+                                    complete_only=complete_only)
+
+
+async def _parse_object(messages: list[dict], content: str, temperature: float):
+    value, _ = _repair(content, root="{")
+    return (value, True) if isinstance(value, dict) else (None, False)
+
+
+async def query_llm_json(prompt: str, temperature: float = 0.0, prompt_version: str = "", schema=None,
+                         model: str = None):
+    """Any JSON object answer to prompt; the caller validates it against schema."""
+    return await _cached_completion(prompt, temperature, prompt_version, schema, _parse_object, model)
+
+
+def _streamed_value(event, schema, item_model):
+    """The event's value if it validates (items against item_model, fields against schema), else None."""
+    if event[0] == "item":
+        if item_model is None:
+            return event[1]
+        valid = structured_output.valid_items([event[1]], item_model)
+        return valid[0] if valid else None
+    if schema is None or event[1] not in schema.model_fields:
+        return event[2]
+    valid, _ = structured_output.split_valid({event[1]: event[2]}, schema)
+    return valid.get(event[1])
+
+
+async def stream_llm_json(prompt: str, temperature: float = 0.3, prompt_version: str = "", root: str = "[{",
+                          schema=None, parse=_parse_object, item_model=None):
+    """
+    Stream a completion and yield JSONStreamParser events as values close.
+
+    Fields (validated against schema) are yielded only if they are valid;
+    items (against item_model) only while every item so far was valid, so an
+    item fixed later never arrives out of order. Once the stream ends, the
+    whole content goes through parse, the repair, validation and follow-up
+    step of the non-streaming calls; values it adds or fixes are yielded
+    then, in order, followed by ("end", result). That result is cached, if
+    complete, under the key the non-streaming calls share, and a cached
+    result is replayed immediately. If the stream fails or nothing valid came back,
+    ("error", detail) is yielded instead of "end".
+    """
+    key = cache_key(LLM_MODEL, temperature, prompt_version, prompt)
+    cached = await run_blocking(llm_cache.get, key)
+    if cached is not None:
+        for event in replay_events(cached):
+            yield event
+        return
+
+    messages = [{"role": "user", "content": prompt}]
+    parser = JSONStreamParser(root)
+    content, yielded, held = "", [], False
+    try:
+        # The llm stage covers the wait for the first byte; the body is
+        # relayed to the client as it arrives.
+        stream = await _create(
+            messages, temperature, schema,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for chunk in stream:
+            # With include_usage the final chunk has no choices, only usage.
+            _log_usage(getattr(chunk, "usage", None))
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            content += chunk.choices[0].delta.content
+            for event in parser.feed(chunk.choices[0].delta.content):
+                if event[0] == "end":
+                    continue
+                value = _streamed_value(event, schema, item_model)
+                if event[0] == "item":
+                    held = held or value is None
+                if value is None or (event[0] == "item" and held):
+                    continue
+                yielded.append(event[:-1] + (value,))
+                yield yielded[-1]
+
+        _log_raw(content)
+        data, complete = await parse(messages, content.strip(), temperature)
     except Exception as e:
-        print("LLM query error:", e)
-        return None
+        log.warning("LLM stream error: %s", e)
+        yield ("error", str(e))
+        return
+    if not data:
+        yield ("error", "no valid JSON in the response")
+        return
+
+    for event in replay_events(data)[:-1]:
+        if event in yielded:
+            yielded.remove(event)
+        else:
+            yield event
+    if complete:
+        await run_blocking(llm_cache.put, key, data)
+    yield ("end", data)
+
+
+async def stream_llm_plan(prompt: str, temperature: float = 0.3, prompt_version: str = ""):
+    """stream_llm_json for a {"plan": [...]} answer: one "item" event per valid day."""
+    # root "[": the parser skips to the "plan" array and yields its days
+    async for event in stream_llm_json(prompt, temperature, prompt_version, root="[", schema=PlanContent,
+                                       parse=_parse_plan, item_model=PlanDay):
+        yield event
+
+
+async def stream_llm_overview(prompt: str, temperature: float = 0.3, prompt_version: str = ""):
+    """stream_llm_json for an overview: one "field" event per valid field."""
+    async for event in stream_llm_json(prompt, temperature, prompt_version, root="{", schema=OverviewContent,
+                                       parse=_parse_overview):
+        yield event
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the LLM response cache."""
+    return llm_cache.stats()
+
+
+def parse_stats() -> dict:
+    """Parse-failure, repair and follow-up counters for LLM JSON output."""
+    return structured_output.stats()
+
+
+def _gauges() -> dict:
+    cache, parse = llm_cache.stats(), structured_output.stats()
+    return {
+        "llm_cache_hit_ratio": cache["hit_ratio"],
+        "llm_cache_memory_entries": cache["memory_entries"],
+        "llm_parse_failure_ratio": parse["parse_failure_rate"],
+        "llm_repair_ratio": parse["repair_rate"],
+    }
+
+
+metrics.register_gauges(_gauges)
@@ -2,154 +2,341 @@
 
 import geonamescache
 from geopy.geocoders import Nominatim
-from rapidfuzz import process, fuzz
 from functools import lru_cache
+import logging
+import os
+import queue
+import threading
+import time
 from timezonefinder import TimezoneFinder
 import pytz
 from datetime import datetime
-import swisseph as swe
+
+from app.services import gazetteer
+from app.services.lazy import Lazy
+from app.services.place_index import NameMatcher, normalize
+from app.services.sign_house_convector import calculate_chiron_position
 
 # ---------------------------
 # Initialize global objects
 # ---------------------------
 
-gc = geonamescache.GeonamesCache()
-cities_data = gc.get_cities()
-countries_data = gc.get_countries()
-geolocator = Nominatim(user_agent="my_app")
-tf = TimezoneFinder()
+log = logging.getLogger(__name__)
 
-# Swiss Ephemeris path (set once)
-swe.set_ephe_path("ephe")  # make sure ephe folder contains ephemeris files
+# Opt-in: geocode gazetteer misses with Nominatim in the background and add
+# them to the gazetteer, at most one request per GEOCODE_BACKFILL_INTERVAL.
+GEOCODE_BACKFILL = os.getenv("GEOCODE_BACKFILL", "false").lower() in ("1", "true", "yes")
+GEOCODE_BACKFILL_INTERVAL = float(os.getenv("GEOCODE_BACKFILL_INTERVAL", "1.0"))
+GEOCODE_BACKFILL_QUEUE = 1000
 
-SIGNS = [
-    'Aries', 'Taurus', 'Gemini', 'Cancer', 'Leo', 'Virgo',
-    'Libra', 'Scorpio', 'Sagittarius', 'Capricorn', 'Aquarius', 'Pisces'
-]
+# Common names that are neither the geonames name nor an ISO code
+COUNTRY_ALIASES = {
+    "UK": "GB", "England": "GB", "Scotland": "GB", "Wales": "GB", "Great Britain": "GB",
+    "USA": "US", "America": "US", "United States of America": "US",
+    "Burma": "MM", "Holland": "NL",
+}
 
 # ---------------------------
-# Prepare lookup structures
+# Prepare lookup structures (built on first use, or by app.startup.warm_up)
 # ---------------------------
 
-country_list = [country['name'] for country in countries_data.values()]
+def _load_geonames() -> dict:
+    gc = geonamescache.GeonamesCache()
+    countries_data = gc.get_countries()
+    return {
+        "cities": gc.get_cities(),
+        "countries": countries_data,
+        "iso_to_country": {iso: c['name'] for iso, c in countries_data.items()},
+    }
+
+def _build_country_matcher() -> NameMatcher:
+    countries_data = geonames()["countries"]
+    return NameMatcher(
+        [(c['name'], iso) for iso, c in countries_data.items()],
+        aliases=[(c['iso3'], iso) for iso, c in countries_data.items()]
+        + [(iso, iso) for iso in countries_data]
+        + list(COUNTRY_ALIASES.items()),
+    )
+
+def _city_entries() -> dict:
+    """
+    Normalized matcher entries keyed by country ISO (None: all countries).
+
+    Canonical names come first, then ASCII alternate names, each by population.
+    """
+    cities = sorted(geonames()["cities"].values(), key=lambda c: -c.get('population', 0))
+    entries = [(c['name'], c) for c in cities]
+    entries += [(alt, c) for c in cities for alt in c.get('alternatenames', []) if alt.isascii()]
+
+    by_country = {None: []}
+    for name, c in entries:
+        entry = (normalize(name), c)
+        by_country[None].append(entry)
+        by_country.setdefault(c['countrycode'], []).append(entry)
+    return by_country
+
+_geonames = Lazy("geonames cities/countries", _load_geonames)
+_country_matcher = Lazy("country matcher", _build_country_matcher)
+# Only needed without a gazetteer
+_normalized_city_entries = Lazy("normalized city names", _city_entries, preload=not gazetteer.available())
+_geolocator = Lazy("nominatim geocoder", lambda: Nominatim(user_agent="my_app"), preload=False)
+_tf = Lazy("timezonefinder", TimezoneFinder, preload=False)
+
+_city_matchers = {}
+_city_matchers_lock = threading.Lock()
+
+
+def geonames() -> dict:
+    """geonamescache cities, countries and ISO -> country name."""
+    return _geonames.get()
+
+def country_matcher() -> NameMatcher:
+    return _country_matcher.get()
+
+def geolocator() -> Nominatim:
+    return _geolocator.get()
+
+def timezone_finder() -> TimezoneFinder:
+    """TimezoneFinder, loaded on first use (only geocoded coordinates need it)."""
+    return _tf.get()
+
+
+def city_matcher(country_iso: str | None) -> NameMatcher:
+    """Matcher over one country's cities (None: all cities), built on first use."""
+    matcher = _city_matchers.get(country_iso)
+    if matcher is None:
+        with _city_matchers_lock:
+            matcher = _city_matchers.get(country_iso)
+            if matcher is None:
+                entries = _normalized_city_entries.get().get(country_iso, [])
+                matcher = NameMatcher(entries, normalized=True)
+                _city_matchers[country_iso] = matcher
+    return matcher
 
-country_to_cities = {}
-city_lookup = {}  # (country_iso, city_name) -> city_data
-for city in cities_data.values():
-    iso = city['countrycode']
-    name = city['name']
-    country_to_cities.setdefault(iso, []).append(name)
-    city_lookup[(iso, name)] = city
 
-iso_to_country = {iso: c['name'] for iso, c in countries_data.items()}
+def warm_city_matchers():
+    """Build the all-countries matcher and every per-country matcher."""
+    if gazetteer.available():
+        return
+    city_matcher(None)
+    for iso in geonames()["countries"]:
+        city_matcher(iso)
 
 # ---------------------------
 # Helper functions
 # ---------------------------
 
-def correct_name(input_name: str, choices: list[str]) -> str:
-    """Fuzzy match input_name against a list of choices."""
-    match = process.extractOne(input_name, choices, scorer=fuzz.WRatio)
-    return match[0] if match else None
+@lru_cache(maxsize=1024)
+def _zone(tz_name: str):
+    return pytz.timezone(tz_name)
 
-def timezone_offset_string(lat: float, lon: float, dt: datetime = None) -> str:
-    """Return UTC offset as +HH:MM or -HH:MM string."""
-    dt = dt or datetime.utcnow()
-    tz_str = tf.timezone_at(lat=lat, lng=lon)
-    if not tz_str:
-        return None
-    tz = pytz.timezone(tz_str)
-    offset_sec = tz.utcoffset(dt).total_seconds()
+@lru_cache(maxsize=65536)
+def _offset_seconds(tz_name: str, dt: datetime) -> int:
+    """
+    UTC offset of local wall time dt in the zone. Keyed by the exact wall
+    time, as transitions need not fall on the hour (e.g. Australia/Lord_Howe,
+    historical :30 zones). A time a DST change repeats or skips is read as
+    standard time, and the offset returned is the one of that reading.
+    """
+    return int(_zone(tz_name).localize(dt, is_dst=False).utcoffset().total_seconds())
+
+def format_offset(offset_sec: int) -> str:
     sign = '+' if offset_sec >= 0 else '-'
     offset_sec = abs(int(offset_sec))
     hours = offset_sec // 3600
     minutes = (offset_sec % 3600) // 60
     return f"{sign}{hours:02d}:{minutes:02d}"
 
-def get_house(longitude: float, houses: list[float]) -> int:
-    """Determine which Placidus house a given longitude belongs to."""
-    for i in range(11):
-        if houses[i] <= longitude < houses[i + 1]:
-            return i + 1
-    return 12
+def zone_offset_string(tz_name: str, dt: datetime = None) -> str:
+    """UTC offset of an IANA zone at local wall time dt (default: now) as +HH:MM."""
+    if dt is None:
+        return format_offset(int(datetime.now(_zone(tz_name)).utcoffset().total_seconds()))
+    return format_offset(_offset_seconds(tz_name, dt))
+
+def birth_timezone_offset(tz_name: str, birth_date: str, birth_time: str) -> str:
+    """
+    UTC offset in force at the local birth date/time, e.g. summer vs winter time.
+
+    Wall times inside a DST change are read as standard time:
+
+    >>> birth_timezone_offset('America/New_York', '2020-11-01', '01:30')  # repeated hour
+    '-05:00'
+    >>> birth_timezone_offset('America/New_York', '2020-03-08', '02:30')  # skipped hour
+    '-05:00'
+    >>> birth_timezone_offset('Australia/Lord_Howe', '2020-04-05', '01:45')  # :30 transition
+    '+10:30'
+    """
+    dt = datetime.strptime(f"{birth_date} {birth_time}", "%Y-%m-%d %H:%M")
+    return zone_offset_string(tz_name, dt)
+
+def timezone_offset_string(lat: float, lon: float, dt: datetime = None) -> str:
+    """Return UTC offset as +HH:MM or -HH:MM string."""
+    tz_str = timezone_finder().timezone_at(lat=lat, lng=lon)
+    if not tz_str:
+        return None
+    return zone_offset_string(tz_str, dt)
 
 # ---------------------------
-# Main service functions
+# Online geocoding backfill (never on the request path)
 # ---------------------------
 
-@lru_cache(maxsize=5000)
-def get_lat_lon_timezone(country_input: str, city_input: str) -> dict | None:
-    """Get city/country lat/lon and UTC offset string."""
-    country = correct_name(country_input, country_list)
-    if not country:
-        return None
+_backfill_queue = queue.Queue(maxsize=GEOCODE_BACKFILL_QUEUE)
+_backfill_pending = set()
+_backfill_lock = threading.Lock()
+
+
+def _geocode_into_gazetteer(city: str, country_iso: str | None):
+    country = geonames()["iso_to_country"].get(country_iso, "") if country_iso else ""
+    location = geolocator().geocode(f"{city}, {country}" if country else city, addressdetails=True, timeout=10)
+    if not location:
+        log.info("Backfill: no geocoding result for %r, %r", city, country)
+        return
+    iso = country_iso or location.raw.get("address", {}).get("country_code", "").upper()
+    tz_name = timezone_finder().timezone_at(lat=location.latitude, lng=location.longitude)
+    gazetteer.add_place(city, iso, location.latitude, location.longitude, tz_name, source="nominatim")
+    log.info("Backfill: added %r (%s) to the gazetteer", city, iso)
+
+
+def _backfill_worker():
+    while True:
+        city, country_iso = _backfill_queue.get()
+        try:
+            _geocode_into_gazetteer(city, country_iso)
+        except Exception as e:
+            log.warning("Backfill of %r failed: %s", city, e)
+        finally:
+            with _backfill_lock:
+                _backfill_pending.discard((city, country_iso))
+        time.sleep(GEOCODE_BACKFILL_INTERVAL)
+
+
+def _start_backfill_thread():
+    thread = threading.Thread(target=_backfill_worker, name="geocode-backfill", daemon=True)
+    thread.start()
+    return thread
+
+
+# Not preloaded: a thread started in the gunicorn master does not survive the fork.
+_backfill_thread = Lazy("geocode backfill thread", _start_backfill_thread, preload=False)
+
+
+def request_backfill(city: str, country_iso: str | None) -> bool:
+    """Queue a gazetteer miss for background geocoding; False if disabled or not queued."""
+    if not GEOCODE_BACKFILL or not city.strip():
+        return False
+    item = (city.strip(), country_iso)
+    with _backfill_lock:
+        if item in _backfill_pending:
+            return False
+        _backfill_pending.add(item)
+    _backfill_thread.get()
+    try:
+        _backfill_queue.put_nowait(item)
+    except queue.Full:
+        with _backfill_lock:
+            _backfill_pending.discard(item)
+        return False
+    return True
+
+# ---------------------------
+# Main service functions
+# ---------------------------
 
-    # Find ISO
-    country_iso = next((iso for iso, c in countries_data.items() if c['name'] == country), None)
-    if not country_iso:
+def _location(city_data: dict | None) -> dict | None:
+    if not city_data:
         return None
+    country = geonames()["iso_to_country"].get(city_data['countrycode'], "")
+    city = city_data['name']
 
-    # Restrict cities to this country
-    candidate_cities = country_to_cities.get(country_iso, [])
-    city = correct_name(city_input, candidate_cities)
-    if not city:
+    # geonamescache and gazetteer cities carry their IANA zone
+    tz_name = city_data.get("timezone")
+    lat = city_data.get("latitude")
+    lon = city_data.get("longitude")
+    if lat is None or lon is None:
         return None
 
-    # Try geonamescache first
-    city_data = city_lookup.get((country_iso, city))
-    if city_data and "latitude" in city_data and "longitude" in city_data:
-        lat = city_data["latitude"]
-        lon = city_data["longitude"]
-    else:
-        # Fallback to geopy
-        location = geolocator.geocode(f"{city}, {country}")
-        if location:
-            lat = location.latitude
-            lon = location.longitude
-        else:
-            return None
-
-    offset_str = timezone_offset_string(lat, lon)
+    if not tz_name:
+        tz_name = timezone_finder().timezone_at(lat=lat, lng=lon)
     return {
         "city": city,
         "country": country,
         "latitude": lat,
         "longitude": lon,
-        "timezone_offset": offset_str
+        "timezone": tz_name
     }
 
-def calculate_chiron(birth_date: str, birth_time: str, timezone_offset: str, latitude: float, longitude: float) -> dict:
-    """Calculate Chiron's zodiac sign, longitude, and house (Placidus)."""
+def _match_city(country_iso: str | None, city_input: str) -> dict | None:
+    """City data from the gazetteer when one is installed, else geonamescache."""
+    if not gazetteer.available():
+        return city_matcher(country_iso).match(city_input)
+    city_data = gazetteer.lookup(city_input, country_iso)
+    if city_data is None:
+        request_backfill(city_input, country_iso)
+    return city_data
 
-    # Convert local time to UTC
-    sign = 1 if timezone_offset[0] == '+' else -1
-    hours, minutes = map(int, timezone_offset[1:].split(":"))
-    offset_min = sign * (hours * 60 + minutes)
-    local_tz = pytz.FixedOffset(offset_min)
+class _Unresolved(Exception):
+    """Raised instead of returning None so lru_cache never keeps a miss."""
 
-    dt = datetime.strptime(f"{birth_date} {birth_time}", "%Y-%m-%d %H:%M")
-    dt_local = local_tz.localize(dt)
-    dt_utc = dt_local.astimezone(pytz.utc)
+@lru_cache(maxsize=5000)
+def _resolve(country_input: str, city_input: str) -> dict:
+    # Without a country, match the city across every country
+    country_iso = None
+    if country_input.strip():
+        country_iso = country_matcher().match(country_input)
+        if not country_iso:
+            raise _Unresolved
+
+    # Restrict cities to this country
+    location = _location(_match_city(country_iso, city_input))
+    if location is None:
+        raise _Unresolved
+    return location
+
+def get_lat_lon_timezone(country_input: str, city_input: str) -> dict | None:
+    """
+    Get city/country lat/lon and IANA timezone name.
 
-    # Julian Day UT
-    jd_ut = swe.julday(dt_utc.year, dt_utc.month, dt_utc.day, dt_utc.hour + dt_utc.minute/60.0)
+    Only hits are cached: a miss is looked up again next time, so a place
+    the geocoding backfill adds (in any worker) is found by every worker.
+    """
+    try:
+        return _resolve(country_input, city_input)
+    except _Unresolved:
+        return None
 
-    # Chiron position
-    chiron_data, _ = swe.calc_ut(jd_ut, swe.CHIRON)
-    chiron_long = chiron_data[0]
+get_lat_lon_timezone.cache_clear = _resolve.cache_clear
 
-    # Zodiac sign
-    zodiac_sign = SIGNS[int(chiron_long // 30)]
+def get_lat_lon_timezone_many(places: list[tuple[str, str]]) -> list[dict | None]:
+    """
+    Batch get_lat_lon_timezone for (country_input, city_input) pairs.
 
-    # House placement
-    houses, ascmc = swe.houses(jd_ut, latitude, longitude, b'P')
-    chiron_house = get_house(chiron_long, houses)
+    Countries are matched first, then cities grouped by matched country, each
+    with the trigram-blocked matchers (one gazetteer lookup per place when a
+    gazetteer is installed). Results come back in input order.
+    """
+    if gazetteer.available():
+        return [get_lat_lon_timezone(country, city) for country, city in places]
+    countries = [country.strip() for country, _ in places]
+    named = [i for i, country in enumerate(countries) if country]
+    country_isos = [None] * len(places)
+    for i, iso in zip(named, country_matcher().match_many([countries[i] for i in named])):
+        country_isos[i] = iso if iso else False
 
-    return {
-        "longitude": round(chiron_long, 2),
-        "zodiac_sign": zodiac_sign,
-        "house": chiron_house
-    }
+    by_country = {}
+    for i, iso in enumerate(country_isos):
+        if iso is not False:
+            by_country.setdefault(iso, []).append(i)
+
+    results = [None] * len(places)
+    for iso, indices in by_country.items():
+        matches = city_matcher(iso).match_many([places[i][1] for i in indices])
+        for i, city_data in zip(indices, matches):
+            results[i] = _location(city_data)
+    return results
+
+def calculate_chiron(birth_date: str, birth_time: str, timezone_offset: str, latitude: float, longitude: float) -> dict:
+    """Calculate Chiron's zodiac sign, longitude, and house (Placidus)."""
+    return calculate_chiron_position(birth_date, birth_time, timezone_offset, latitude, longitude)
 
 # ---------------------------
 # Combined utility
@@ -158,13 +345,14 @@ def calculate_chiron(birth_date: str, birth_time: str, timezone_offset: str, lat
 def get_chiron_by_city(country_input: str, city_input: str, birth_date: str, birth_time: str) -> dict | None:
     """Full service: from city/country + birth data → Chiron info with timezone."""
     loc_info = get_lat_lon_timezone(country_input, city_input)
-    if not loc_info:
+    if not loc_info or not loc_info["timezone"]:
         return None
 
+    timezone_offset = birth_timezone_offset(loc_info["timezone"], birth_date, birth_time)
     chiron_info = calculate_chiron(
         birth_date=birth_date,
         birth_time=birth_time,
-        timezone_offset=loc_info["timezone_offset"],
+        timezone_offset=timezone_offset,
         latitude=loc_info["latitude"],
         longitude=loc_info["longitude"]
     )
@@ -174,6 +362,7 @@ def get_chiron_by_city(country_input: str, city_input: str, birth_date: str, bir
         "country": loc_info["country"],
         "latitude": loc_info["latitude"],
         "longitude": loc_info["longitude"],
-        "timezone_offset": loc_info["timezone_offset"],
+        "timezone": loc_info["timezone"],
+        "timezone_offset": timezone_offset,
         "chiron": chiron_info
     }
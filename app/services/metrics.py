@@ -0,0 +1,140 @@
+"""
+In-process request metrics.
+
+Stages of a request (location, ephemeris, embedding, search, prompt, llm,
+parse) are timed with stage(), which records into the stage_seconds
+histogram and, while a request is being served, into that request's
+timings for the Server-Timing header. Counters hold token counts and cache
+lookups; gauge sources (register_gauges) are read at scrape time.
+
+render() produces the Prometheus text format. Every gunicorn worker keeps
+its own numbers, so scrape workers individually or aggregate by instance.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "stage_seconds": "Latency of one request stage",
+    "http_request_seconds": "Request latency by route",
+    "llm_tokens_total": "LLM tokens by kind (prompt, cached, completion)",
+    "prompts_built_total": "Prompts built by prompt",
+    "prompt_tokens_total": "Locally counted prompt tokens by part (total, prefix, cacheable, context)",
+    "prompt_context_chunks_total": "Retrieved chunks kept in or dropped from prompts",
+    "query_embedding_cache_total": "Query embedding cache lookups by result",
+    "gazetteer_lookups_total": "Offline gazetteer city lookups by result (exact, fuzzy, miss)",
+}
+
+_lock = threading.Lock()
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count], sum
+_counters = {}    # (name, labels) -> value
+_gauge_sources = []
+
+# Per-request stage durations, set by the Server-Timing middleware
+_timings = contextvars.ContextVar("stage_timings", default=None)
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name: str, value: float, **labels):
+    """Add value to the histogram name{labels}."""
+    key = _key(name, labels)
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+        entry[0][bisect.bisect_left(BUCKETS, value)] += 1
+        entry[1] += value
+
+
+def inc(name: str, amount: float = 1, **labels):
+    """Add amount to the counter name{labels}."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def register_gauges(source):
+    """source() -> {name: value}, evaluated on every scrape."""
+    _gauge_sources.append(source)
+
+
+@contextmanager
+def stage(name: str):
+    """Time the block as stage `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("stage_seconds", elapsed, stage=name)
+        timings = _timings.get()
+        if timings is not None:
+            # Concurrent stages (e.g. sign and house retrieval) add up.
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def request_timings():
+    """Collect the stage durations of the current request; yields the dict."""
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def server_timing(timings: dict, total: float = None) -> str:
+    """Server-Timing header value, durations in milliseconds."""
+    entries = [f"{name};dur={1000 * seconds:.1f}" for name, seconds in timings.items()]
+    if total is not None:
+        entries.append(f"total;dur={1000 * total:.1f}")
+    return ", ".join(entries)
+
+
+def _labels(labels: tuple, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _header(lines: list, seen: set, name: str, kind: str):
+    if name not in seen:
+        seen.add(name)
+        if name in HELP:
+            lines.append(f"# HELP {name} {HELP[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {k: (list(v[0]), v[1]) for k, v in _histograms.items()}
+        counters = dict(_counters)
+
+    lines, seen = [], set()
+    for (name, labels), (buckets, total) in sorted(histograms.items()):
+        _header(lines, seen, name, "histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), buckets):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+            lines.append(f"{name}_bucket{_labels(labels, le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {total}")
+        lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    for (name, labels), value in sorted(counters.items()):
+        _header(lines, seen, name, "counter")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    for source in _gauge_sources:
+        for name, value in sorted(source().items()):
+            _header(lines, seen, name, "gauge")
+            lines.append(f"{name} {float(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,225 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+import numpy as np
+import openai
+from dotenv import load_dotenv
+from openai import OpenAI, AsyncOpenAI
+
+from app.services import metrics
+from app.services.lazy import Lazy
+
+load_dotenv()
+
+# Connection pool shared by every request of a worker process
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+# Per-call read timeouts (seconds)
+OPENAI_CHAT_TIMEOUT = float(os.getenv("OPENAI_CHAT_TIMEOUT", "60"))
+OPENAI_EMBED_TIMEOUT = float(os.getenv("OPENAI_EMBED_TIMEOUT", "10"))
+# Retries of 429 / 5xx / connection errors, with full-jitter exponential backoff
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "8"))
+# Operations ("chat", "embeddings") that send a second attempt once the first
+# outlives the OPENAI_HEDGE_PERCENTILE of recent latencies. Off by default:
+# a hedged completion can be paid for twice.
+OPENAI_HEDGE = {op.strip() for op in os.getenv("OPENAI_HEDGE", "").split(",") if op.strip()}
+OPENAI_HEDGE_PERCENTILE = float(os.getenv("OPENAI_HEDGE_PERCENTILE", "95"))
+OPENAI_HEDGE_MIN_SAMPLES = 20
+# Consecutive failures that open the circuit, and how long it stays open
+OPENAI_BREAKER_FAILURES = int(os.getenv("OPENAI_BREAKER_FAILURES", "5"))
+OPENAI_BREAKER_RESET = float(os.getenv("OPENAI_BREAKER_RESET", "30"))
+
+RETRYABLE = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+
+class UpstreamUnavailable(Exception):
+    """OpenAI is failing or the circuit is open; callers should answer 503."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY)
+
+
+def _timeout(read: float) -> httpx.Timeout:
+    return httpx.Timeout(read, connect=OPENAI_CONNECT_TIMEOUT)
+
+
+def _build_async_client() -> AsyncOpenAI:
+    # Retries are done by call() so they share the backoff and the breaker.
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=0,
+        http_client=openai.DefaultAsyncHttpxClient(limits=_limits(), timeout=_timeout(OPENAI_CHAT_TIMEOUT)),
+    )
+
+
+def _build_sync_client() -> OpenAI:
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=openai.DefaultHttpxClient(limits=_limits(), timeout=_timeout(OPENAI_CHAT_TIMEOUT)),
+    )
+
+
+# One client of each kind per worker process, shared by embedding_service and
+# llm_service. Not preloaded: HTTP connection pools must not cross a fork.
+_sync_client = Lazy("openai sync client", _build_sync_client, preload=False)
+_async_client = Lazy("openai async client", _build_async_client, preload=False)
+
+
+def sync_client() -> OpenAI:
+    """Client for offline jobs (ingestion, warm-up); retries are the SDK's own."""
+    return _sync_client.get()
+
+
+def async_client() -> AsyncOpenAI:
+    """Client for the request path; send requests through call()."""
+    return _async_client.get()
+
+
+class CircuitBreaker:
+    """
+    Closed: calls pass. After `failures` consecutive failures it opens and
+    rejects calls for `reset_seconds`; then one trial call is let through
+    (half-open), which closes it on success or reopens it on failure.
+    """
+
+    def __init__(self, failures: int = OPENAI_BREAKER_FAILURES, reset_seconds: float = OPENAI_BREAKER_RESET):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state, self._trial = "half_open", False
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        return max(1.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def success(self):
+        with self._lock:
+            self.state, self.consecutive, self._trial = "closed", 0, False
+
+    def failure(self):
+        with self._lock:
+            self.consecutive += 1
+            if self.state == "half_open" or self.consecutive >= self.failures:
+                self.state, self.opened_at, self._trial = "open", time.monotonic(), False
+
+    def abandon(self):
+        """A call ended without an outcome (cancelled); let another trial through."""
+        with self._lock:
+            self._trial = False
+
+
+breaker = CircuitBreaker()
+_latencies = {}  # operation -> recent successful call durations
+
+
+def _hedge_delay(operation: str) -> float | None:
+    recent = _latencies.get(operation)
+    if recent is None or len(recent) < OPENAI_HEDGE_MIN_SAMPLES:
+        return None
+    return float(np.percentile(recent, OPENAI_HEDGE_PERCENTILE))
+
+
+def _backoff(attempt: int, error: Exception) -> float:
+    delay = random.uniform(0, min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * 2 ** attempt))
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        delay = max(delay, min(OPENAI_BACKOFF_MAX, float(retry_after)))
+    except (TypeError, ValueError):
+        pass
+    return delay
+
+
+async def _hedged(operation: str, request, timeout):
+    """request(timeout), with a second attempt racing it past the hedge deadline."""
+    first = asyncio.ensure_future(request(timeout))
+    pending = {first}
+    try:
+        delay = _hedge_delay(operation)
+        if delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                metrics.inc("openai_hedges_total", operation=operation)
+                pending.add(asyncio.ensure_future(request(timeout)))
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        metrics.inc("openai_hedge_wins_total", operation=operation)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call(operation: str, request, timeout: float, hedge: bool = None):
+    """
+    Await request(timeout) with retries, optional hedging and the circuit breaker.
+
+    request builds one SDK call for the given per-call timeout. 429, 5xx and
+    connection errors are retried up to OPENAI_MAX_RETRIES times; when they
+    persist, or the circuit is open, UpstreamUnavailable is raised. Other
+    errors (bad request, auth) are raised unchanged.
+    """
+    hedge = operation in OPENAI_HEDGE if hedge is None else hedge
+    timeout = _timeout(timeout)
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        if not breaker.allow():
+            metrics.inc("openai_rejected_total", operation=operation)
+            raise UpstreamUnavailable(f"OpenAI circuit open ({operation})", breaker.retry_after())
+        start = time.perf_counter()
+        try:
+            result = await (_hedged(operation, request, timeout) if hedge else request(timeout))
+        except RETRYABLE as e:
+            breaker.failure()
+            metrics.inc("openai_errors_total", operation=operation, error=type(e).__name__)
+            if attempt == OPENAI_MAX_RETRIES:
+                raise UpstreamUnavailable(f"OpenAI {operation} failed: {e}") from e
+            metrics.inc("openai_retries_total", operation=operation)
+            await asyncio.sleep(_backoff(attempt, e))
+            continue
+        except openai.APIStatusError:
+            breaker.success()  # the upstream answered; the request itself was bad
+            raise
+        except BaseException:
+            breaker.abandon()
+            raise
+        breaker.success()
+        _latencies.setdefault(operation, deque(maxlen=200)).append(time.perf_counter() - start)
+        return result
+
+
+metrics.register_gauges(lambda: {"openai_circuit_open": float(breaker.state != "closed")})
@@ -1,7 +1,13 @@
-from app.services.llm_service import query_llm_overview
+from app.services.json_stream import replay_events
+from app.services.llm_service import query_llm_overview, stream_llm_overview
+from app.services.prompt_builder import PromptBuilder
+from app.services.translation_service import is_canonical, translate
 
-PROMPT_TEMPLATE = """
-You are a guide. Based on Chiron in House {house} and Sign {sign}, 
+# Bump when the prompt text or layout changes meaning; it is part of the LLM cache key.
+PROMPT_VERSION = "overview-v2"
+
+PROMPT_INSTRUCTIONS = """
+You are a guide. Based on the Chiron placement (House and Sign) given at the end, 
 generate an **overview summary** of the wound and healing journey.
 
 Important Instruction:
@@ -21,9 +27,6 @@ Output must be a **valid JSON object** with:
 - "healingBenefits": ["List Five or Seven healing outcomes — personal growth, peace, transformation — that come from facing and healing this wound."]
 - "reflectiveQuestions": ["Six Likert-scale, close-ended questions ( the answer format is don't need to add in response Strongly Agree, Agree, Neutral, Disagree, Strongly Disagree) asking: 'How did this reading resonate with your sign and house placement?' Each question should confirm themes of wounds, struggles, and healing resonance."]
 
-Context:
-{context}
-
 Notes for writing:
                     - For `description`: Provide a brief but emotionally deep overview of the Chiron wound and healing potential.
                     - For keyword sections: Only list **relevant themes as short phrases**.
@@ -31,25 +34,64 @@ Notes for writing:
                     - For the meditation name exactly as given in the context. Do not change, rewrite, or invent new names.
 """
 
+# Variable part, appended after the static instructions.
+PROMPT_REQUEST = """
+Placement: Chiron in House {house} and Sign {sign}
+
+Context:
+{context}
+"""
+
+PROMPT = PromptBuilder("overview", PROMPT_INSTRUCTIONS, PROMPT_REQUEST)
+
+
+OVERVIEW_FIELDS = {
+    "description": "",
+    "coreWoundsAndEmotionalThemes": [],
+    "patternsAndStruggles": [],
+    "healingAndTransformation": [],
+    "spiritualWisdomAndGifts": [],
+    "woundPoints": [],
+    "patternsConnectedToThisWound": [],
+    "healingBenefits": [],
+    "reflectiveQuestions": [],
+}
+
+
+def _overview(data: dict) -> dict:
+    return {field: data.get(field, type(default)()) for field, default in OVERVIEW_FIELDS.items()}
+
 
-def generate_overview(context: str, sign: str, house: str, language: str):
-    prompt = PROMPT_TEMPLATE.format(context=context, sign=sign, house=house)
-    data = query_llm_overview(prompt)
+async def generate_overview(context: list[str], sign: str, house: str, language: str, complete_only: bool = False):
+    """
+    The canonical (English) overview for the placement, translated into
+    language. With complete_only an overview still missing fields is None
+    instead of having them filled with empty values.
+    """
+    prompt = PROMPT.build(context, sign=sign, house=house).text
+    data = await query_llm_overview(prompt, prompt_version=PROMPT_VERSION, complete_only=complete_only)
     if not data:
         return None
 
-    return {
-        "description": data.get("description", ""),
-        "coreWoundsAndEmotionalThemes": data.get("coreWoundsAndEmotionalThemes", []),
-        "patternsAndStruggles": data.get("patternsAndStruggles", []),
-        "healingAndTransformation": data.get("healingAndTransformation", []),
-        "spiritualWisdomAndGifts": data.get("spiritualWisdomAndGifts", []),
-        "woundPoints": data.get("woundPoints", []),
-        "patternsConnectedToThisWound": data.get("patternsConnectedToThisWound", []),
-        "healingBenefits": data.get("healingBenefits", []),
-        "reflectiveQuestions": data.get("reflectiveQuestions", []),
+    return await translate(_overview(data), language)
 
-    }
 
-   
+async def stream_overview(context: list[str], sign: str, house: str, language: str):
+    """
+    Yield ("field", name, value) for each overview field as soon as it
+    closes in the LLM stream, then ("end", overview); without "end" the
+    overview could not be generated. Other languages need the whole
+    canonical overview before it can be translated, so they arrive all at once.
+    """
+    if not is_canonical(language):
+        overview = await generate_overview(context, sign, house, language)
+        for event in replay_events(overview) if overview else []:
+            yield event
+        return
 
+    prompt = PROMPT.build(context, sign=sign, house=house).text
+    async for event in stream_llm_overview(prompt, prompt_version=PROMPT_VERSION):
+        if event[0] == "field" and event[1] in OVERVIEW_FIELDS:
+            yield event
+        elif event[0] == "end":
+            yield "end", _overview(event[1])
@@ -1,11 +1,23 @@
+import glob
+import multiprocessing
+import os
+import re
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+
 import fitz
 
+from app.services.chiron_table import SIGNS
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
 def extract_text_from_pdf(pdf_path: str) -> str:
     doc = fitz.open(pdf_path)
-    text = ""
-    for page in doc:
-        text += page.get_text("text")
-    return text
+    return "".join(page.get_text("text") for page in doc)
 
 
 def chunk_text(text: str, max_len: int = 200) -> list[str]:
@@ -20,3 +32,235 @@ def chunk_text(text: str, max_len: int = 200) -> list[str]:
     if chunk:
         chunks.append(" ".join(chunk))
     return chunks
+
+
+# ---------------------------
+# Streaming multi-document pipeline
+# ---------------------------
+
+@dataclass(frozen=True)
+class Chunk:
+    text: str
+    document: str
+    page: int    # page (0-based) where the chunk starts
+    offset: int  # word offset of the chunk within its document
+    sign: str | None = None   # section tags, set by section-aware chunking
+    house: str | None = None
+
+
+def find_documents(paths: list[str]) -> list[str]:
+    """Expand directories to the PDFs they contain; files are kept as given. Duplicates are dropped."""
+    documents = []
+    for path in paths:
+        if os.path.isdir(path):
+            documents += sorted(glob.glob(os.path.join(path, "*.pdf")))
+        else:
+            documents.append(path)
+    return list(dict.fromkeys(documents))
+
+
+# One open PyMuPDF handle per document, per worker process
+_open_documents = {}
+
+
+def _page_text(pdf_path: str, page_no: int) -> str:
+    doc = _open_documents.get(pdf_path)
+    if doc is None:
+        doc = _open_documents[pdf_path] = fitz.open(pdf_path)
+    return doc[page_no].get_text("text")
+
+
+# ---------------------------
+# Section detection
+# ---------------------------
+
+_SIGN_RE = re.compile(r"\b(" + "|".join(SIGNS) + r")\b", re.IGNORECASE)
+_HOUSE_RE = re.compile(r"\b(1[0-2]|[1-9])(?:st|nd|rd|th)\b(?:\s+house\b)?", re.IGNORECASE)
+_LIST_ITEM_RE = re.compile(r"^\s*(\d+\.|day \d+\b)", re.IGNORECASE)
+_OBJECT_KEY_RE = re.compile(r'^\s*"([^"]+)"\s*:\s*\{')  # '"Chiron in Aries": {' in embedded JSON
+_BULLETS = {"•", "●", "◦", "-", "–", "*"}
+_BOLD = 16  # PyMuPDF span flag
+
+
+def _ordinal(n: int) -> str:
+    suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+
+def section_tags(text: str) -> dict:
+    """
+    Sign and house named in a heading: 'Chiron in Aries / 1st House' ->
+    {'sign': 'Aries', 'house': '1st'}. Also normalizes request values
+    ('aries', '7th House'), so lookups and headings agree on tag values.
+    """
+    tags = {}
+    sign = _SIGN_RE.search(text)
+    if sign:
+        tags["sign"] = sign.group(1).capitalize()
+    house = _HOUSE_RE.search(text)
+    if house:
+        tags["house"] = _ordinal(int(house.group(1)))
+    return tags
+
+
+def _line_text(line: dict) -> str:
+    return "".join(span["text"] for span in line["spans"])
+
+
+def _is_heading_line(line: dict) -> bool:
+    """Bold, or led by a symbol glyph (zodiac signs, emoji markers)."""
+    spans = [span for span in line["spans"] if span["text"].strip()]
+    if not spans:
+        return False
+    first = spans[0]
+    return bool(first["flags"] & _BOLD) or unicodedata.category(first["text"].strip()[0]) == "So"
+
+
+def _page_sections(pdf_path: str, page_no: int) -> list[tuple[dict | None, str]]:
+    """
+    Page text split at section headings, as (tags, text) segments.
+
+    tags is None for text that continues the current section. A heading that
+    names a sign or house starts a section tagged with them; any other
+    heading that follows a blank line (a title rather than a bold table cell
+    or list item) starts an untagged section. Headings are bold or
+    symbol-led lines; in embedded JSON, an object key naming a sign or house
+    also counts.
+    """
+    doc = _open_documents.get(pdf_path)
+    if doc is None:
+        doc = _open_documents[pdf_path] = fitz.open(pdf_path)
+
+    segments = [(None, "")]
+    for block in doc[page_no].get_text("dict")["blocks"]:
+        lines = block.get("lines", [])
+        after_blank, previous, i = False, "", 0
+        while i < len(lines):
+            text = _line_text(lines[i])
+            is_item = previous.strip() in _BULLETS or _LIST_ITEM_RE.match(text)
+            key = _OBJECT_KEY_RE.match(text)
+            if key and section_tags(key.group(1)):
+                segments.append((section_tags(key.group(1)), text + "\n"))
+                previous, after_blank = text, False
+                i += 1
+                continue
+            if _is_heading_line(lines[i]) and not is_item:
+                run = [text.strip()]
+                i += 1
+                while i < len(lines) and _is_heading_line(lines[i]) and not _LIST_ITEM_RE.match(_line_text(lines[i])):
+                    run.append(_line_text(lines[i]).strip())
+                    i += 1
+                heading = " ".join(run)
+                tags = section_tags(heading)
+                if tags or after_blank:
+                    segments.append((tags, heading + "\n"))
+                else:
+                    segments[-1] = (segments[-1][0], segments[-1][1] + heading + "\n")
+                previous, after_blank = heading, False
+                continue
+            segments[-1] = (segments[-1][0], segments[-1][1] + text + "\n")
+            after_blank = not text.strip()
+            previous = text
+            i += 1
+    return segments
+
+
+def _page_count(pdf_path: str) -> int:
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def iter_pages(pdf_paths: list[str], workers: int = None, sections: bool = False):
+    """
+    Yield (pdf_path, page_no, text) for every page, in document order.
+
+    Pages are extracted on a process pool of `workers` processes (0 extracts
+    in-process). At most a few pages per worker are in flight, so memory does
+    not grow with document size. With sections=True, text is a list of
+    (tags, text) segments from _page_sections instead of a string.
+    """
+    workers = INGEST_WORKERS if workers is None else workers
+    extract = _page_sections if sections else _page_text
+    tasks = ((path, page_no) for path in pdf_paths for page_no in range(_page_count(path)))
+    if workers <= 0:
+        for path, page_no in tasks:
+            yield path, page_no, extract(path, page_no)
+        return
+
+    # spawn: the caller may be a threaded server process
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        in_flight = deque()
+        for path, page_no in tasks:
+            in_flight.append((path, page_no, pool.submit(extract, path, page_no)))
+            if len(in_flight) >= workers * 4:
+                path, page_no, future = in_flight.popleft()
+                yield path, page_no, future.result()
+        while in_flight:
+            path, page_no, future = in_flight.popleft()
+            yield path, page_no, future.result()
+
+
+def chunk_pages(pages, max_len: int = 200, overlap: int = 0):
+    """
+    Turn a (pdf_path, page_no, text) stream into word-window Chunks.
+
+    Windows hold max_len words and consecutive windows share `overlap`
+    words. Windows never span two documents, nor two sections when pages
+    come as (tags, text) segments; chunks carry their section's tags. With
+    overlap=0 a plain-text document yields the same chunks as
+    chunk_text(extract_text_from_pdf(path)).
+    """
+    if not 0 <= overlap < max_len:
+        raise ValueError("overlap must be between 0 and max_len - 1")
+
+    document = None
+    tags = {}
+    window = deque()  # (word, page_no)
+    word_offset = 0   # words seen in the current document
+    fresh = 0         # words in the window not yet emitted in any chunk
+    for path, page_no, content in pages:
+        if path != document:
+            if fresh:
+                yield _window_chunk(document, window, word_offset, tags)
+            document, tags, window, word_offset, fresh = path, {}, deque(), 0, 0
+        segments = [(None, content)] if isinstance(content, str) else content
+        for section, text in segments:
+            if section is not None:
+                if fresh:
+                    yield _window_chunk(document, window, word_offset, tags)
+                tags, window, fresh = section, deque(), 0
+            for word in text.split():
+                window.append((word, page_no))
+                word_offset += 1
+                fresh += 1
+                if len(window) >= max_len:
+                    yield _window_chunk(document, window, word_offset, tags)
+                    for _ in range(max_len - overlap):
+                        window.popleft()
+                    fresh = 0
+    if fresh:
+        yield _window_chunk(document, window, word_offset, tags)
+
+
+def _window_chunk(document: str, window, word_offset: int, tags: dict) -> Chunk:
+    return Chunk(
+        text=" ".join(word for word, _ in window),
+        document=document,
+        page=window[0][1],
+        offset=word_offset - len(window),
+        sign=tags.get("sign"),
+        house=tags.get("house"),
+    )
+
+
+def stream_chunks(pdf_paths: list[str], max_len: int = 200, overlap: int = 0, workers: int = None,
+                  sections: bool = False):
+    """Chunks for all documents, extracted in parallel and chunked as pages arrive."""
+    return chunk_pages(iter_pages(pdf_paths, workers, sections), max_len=max_len, overlap=overlap)
+
+
+def batched(iterable, size: int):
+    """Yield lists of up to `size` consecutive items."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
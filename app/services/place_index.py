@@ -0,0 +1,82 @@
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from rapidfuzz import process, fuzz
+
+# Full WRatio scoring only runs over the entries sharing the most trigrams
+# with the query, instead of the whole name list.
+MAX_CANDIDATES = 200
+
+_non_alnum = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(name: str) -> str:
+    """Lowercase, ASCII-fold and collapse punctuation: 'São  Paulo' -> 'sao paulo'."""
+    folded = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    return _non_alnum.sub(" ", folded.lower()).strip()
+
+
+def trigrams(name: str) -> set[str]:
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameMatcher:
+    """
+    Exact + fuzzy lookup over a fixed list of (name, target) entries.
+
+    Entries are normalized once (pass normalized=True if they already are). A normalized exact match is a dict hit;
+    otherwise candidates are blocked by shared trigrams and scored with
+    fuzz.WRatio. Aliases only take part in exact lookup. Earlier entries
+    win ties, so callers list canonical names and more populous places first.
+    """
+
+    def __init__(self, entries: list[tuple[str, object]], aliases: list[tuple[str, object]] = (),
+                 normalized: bool = False):
+        self.names = []
+        self.targets = []
+        self.exact = {}
+        self.grams = defaultdict(list)
+        seen = set()
+        for name, target in entries:
+            key = name if normalized else normalize(name)
+            if not key or (key, id(target)) in seen:
+                continue
+            seen.add((key, id(target)))
+            entry_id = len(self.names)
+            self.names.append(key)
+            self.targets.append(target)
+            self.exact.setdefault(key, target)
+            for gram in trigrams(key):
+                self.grams[gram].append(entry_id)
+        # Aliases (codes, abbreviations) only count as exact matches.
+        for name, target in aliases:
+            self.exact.setdefault(normalize(name), target)
+
+    def _candidates(self, query: str) -> list[int]:
+        counts = Counter()
+        for gram in trigrams(query):
+            counts.update(self.grams.get(gram, ()))
+        return sorted(entry_id for entry_id, _ in counts.most_common(MAX_CANDIDATES))
+
+    def match(self, query: str):
+        """Best target for query, or None if nothing scores above zero."""
+        key = normalize(query)
+        if key in self.exact:
+            return self.exact[key]
+        if not self.names:
+            return None
+
+        candidates = self._candidates(key) or range(len(self.names))
+        match = process.extractOne(key, [self.names[i] for i in candidates], scorer=fuzz.WRatio)
+        if not match or match[1] <= 0:
+            return None
+        return self.targets[candidates[match[2]]]
+
+    def match_many(self, queries: list[str]) -> list:
+        """
+        match() for each query. Every fuzzy lookup is trigram-blocked to a few
+        hundred candidates, which is far cheaper than one cdist over all names.
+        """
+        return [self.match(query) for query in queries]
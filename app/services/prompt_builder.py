@@ -0,0 +1,150 @@
+"""
+Prompt assembly with a token budget and a cache-friendly layout.
+
+Every prompt starts with the service's static instruction block, which is
+byte-identical across requests so provider-side prefix caching can reuse
+it. The per-request part (placement and retrieved context) follows. The
+context is deduplicated and trimmed to PROMPT_CONTEXT_TOKENS, dropping the
+lowest-priority chunks first.
+
+The provider only caches prefixes of at least CACHE_MIN_TOKENS (1024)
+tokens. The plan and overview instructions are about 600 tokens, so today
+their cacheable prefix is 0: the layout is ready for caching, but it only
+pays off once the instructions (or another static block placed before the
+request part) reach that size. prompt_tokens_total{part="cacheable"} shows
+when it does.
+
+Tokens are counted locally with tiktoken for LLM_MODEL. If tiktoken or its
+encoding file is unavailable, a conservative characters/3 estimate is used.
+"""
+import logging
+import os
+from dataclasses import dataclass
+
+from app.services import metrics
+from app.services.lazy import Lazy
+from app.services.llm_service import LLM_MODEL
+
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", "3000"))
+# OpenAI caches prompt prefixes of at least 1024 tokens, in 128-token steps.
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+CHUNK_SEPARATOR = "\n\n"
+
+log = logging.getLogger(__name__)
+
+
+def _load_encoding():
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(LLM_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        log.warning("tiktoken unavailable (%s); estimating token counts", type(e).__name__)
+        return None
+
+
+_encoding = Lazy("tokenizer", _load_encoding)
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding.get()
+    if encoding is None:
+        return len(text) // 3 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of text within max_tokens."""
+    encoding = _encoding.get()
+    if encoding is None:
+        return text[:max(0, max_tokens - 1) * 3]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def cacheable_tokens(prefix_tokens: int) -> int:
+    """How much of a static prefix the provider can serve from its prompt cache."""
+    if prefix_tokens < CACHE_MIN_TOKENS:
+        return 0
+    return CACHE_MIN_TOKENS + (prefix_tokens - CACHE_MIN_TOKENS) // CACHE_STEP_TOKENS * CACHE_STEP_TOKENS
+
+
+def select_context(chunks: list[str], budget: int) -> tuple[list[str], int]:
+    """
+    Deduplicate chunks (keeping the first occurrence) and keep them in order
+    while they fit in budget tokens. If not even the first fits, it is
+    truncated. Returns (kept chunks, number dropped).
+    """
+    unique = list(dict.fromkeys(chunk.strip() for chunk in chunks if chunk and chunk.strip()))
+    kept, used = [], 0
+    separator = count_tokens(CHUNK_SEPARATOR)
+    for chunk in unique:
+        cost = count_tokens(chunk) + (separator if kept else 0)
+        if used + cost > budget:
+            break
+        kept.append(chunk)
+        used += cost
+    if not kept and unique and budget > 0:
+        kept = [truncate_tokens(unique[0], budget)]
+    return kept, len(unique) - len(kept)
+
+
+@dataclass(frozen=True)
+class Prompt:
+    text: str
+    prompt_tokens: int
+    prefix_tokens: int     # static instruction block
+    cached_prefix_tokens: int  # part of the prefix eligible for provider caching
+    context_tokens: int
+    chunks: int
+    dropped: int
+
+
+class PromptBuilder:
+    """
+    Builds prompts as <static instructions><request template>.
+
+    instructions must not vary between requests; request_template is
+    formatted with the request fields and the selected context.
+    """
+
+    def __init__(self, name: str, instructions: str, request_template: str):
+        self.name = name
+        self.instructions = instructions
+        self.request_template = request_template
+        self._prefix_tokens = None
+
+    @property
+    def prefix_tokens(self) -> int:
+        if self._prefix_tokens is None:
+            self._prefix_tokens = count_tokens(self.instructions)
+        return self._prefix_tokens
+
+    def build(self, context: list[str], budget: int = None, **fields) -> Prompt:
+        budget = PROMPT_CONTEXT_TOKENS if budget is None else budget
+        with metrics.stage("prompt"):
+            kept, dropped = select_context(context, budget)
+            context_text = CHUNK_SEPARATOR.join(kept)
+            text = self.instructions + self.request_template.format(context=context_text, **fields)
+            prompt = Prompt(
+                text=text,
+                prompt_tokens=count_tokens(text),
+                prefix_tokens=self.prefix_tokens,
+                cached_prefix_tokens=cacheable_tokens(self.prefix_tokens),
+                context_tokens=count_tokens(context_text),
+                chunks=len(kept),
+                dropped=dropped,
+            )
+        metrics.inc("prompts_built_total", prompt=self.name)
+        metrics.inc("prompt_tokens_total", prompt.prompt_tokens, prompt=self.name, part="total")
+        metrics.inc("prompt_tokens_total", prompt.prefix_tokens, prompt=self.name, part="prefix")
+        metrics.inc("prompt_tokens_total", prompt.cached_prefix_tokens, prompt=self.name, part="cacheable")
+        metrics.inc("prompt_tokens_total", prompt.context_tokens, prompt=self.name, part="context")
+        metrics.inc("prompt_context_chunks_total", prompt.chunks, prompt=self.name, result="kept")
+        metrics.inc("prompt_context_chunks_total", prompt.dropped, prompt=self.name, result="dropped")
+        log.debug("Prompt %s: %d tokens (static prefix %d, cacheable %d, context %d from %d chunks, %d dropped)",
+                  self.name, prompt.prompt_tokens, prompt.prefix_tokens, prompt.cached_prefix_tokens,
+                  prompt.context_tokens, prompt.chunks, prompt.dropped)
+        return prompt
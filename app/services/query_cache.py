@@ -0,0 +1,80 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+QUERY_CACHE_FILE = os.getenv("QUERY_CACHE_FILE", "app/vector_db/query_cache.sqlite")
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+
+
+def cache_key(model: str, query: str) -> str:
+    """Content address for a query embedding: sha256 over model and text."""
+    return hashlib.sha256(f"{model}\0{query}".encode("utf-8")).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """
+    In-memory LRU of query embeddings backed by a SQLite file.
+
+    The file is shared by every worker, so a warm-up run (or any worker)
+    fills it once and all others read from it on their first miss.
+    """
+
+    def __init__(self, path: str = QUERY_CACHE_FILE, maxsize: int = QUERY_CACHE_SIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT, query TEXT, vector BLOB)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def get(self, model: str, query: str) -> np.ndarray | None:
+        key = cache_key(model, query)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                return vector
+
+        row = self._conn().execute(
+            "SELECT vector FROM query_embeddings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        vector = np.frombuffer(row[0], dtype=np.float32)
+        self._remember(key, vector)
+        return vector
+
+    def put(self, model: str, query: str, vector: np.ndarray):
+        key = cache_key(model, query)
+        vector = np.asarray(vector, dtype=np.float32)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)",
+                (key, model, query, vector.tobytes()),
+            )
+        self._remember(key, vector)
+
+
+query_cache = QueryEmbeddingCache()
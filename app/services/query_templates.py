@@ -0,0 +1,16 @@
+from app.services.sign_house_convector import SIGNS, HOUSES
+
+QUERY_SUFFIX = "House, Life Area Focus Extra Daily, Prompt, meditation"
+
+
+def sign_query(sign: str) -> str:
+    return "Chiron in " + sign + QUERY_SUFFIX
+
+
+def house_query(house: str) -> str:
+    return house + QUERY_SUFFIX
+
+
+def all_queries() -> list[str]:
+    """Every templated retrieval query the routes can issue."""
+    return [sign_query(sign) for sign in SIGNS] + [house_query(house) for house in HOUSES]
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from app.services.ann_index import apply_search_params
+from app.services.embedding_service import EMBED_MODEL
+from app.services.ingest_service import ingest
+from app.services.pdf_service import find_documents
+from app.services import vector_store
+
+PDF_PATH = os.getenv("PDF_PATH", "app/document/Chiron_Healing_Map.pdf")
+# Comma-separated PDFs and/or directories of PDFs to index (default PDF_PATH).
+DOCUMENT_PATHS = [p.strip() for p in os.getenv("DOCUMENT_PATHS", PDF_PATH).split(",") if p.strip()]
+CHUNK_MAX_LEN = 200
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "0"))
+# "words" (fixed windows) or "sections" (split and tagged at sign/house headings)
+CHUNK_METHOD = os.getenv("CHUNK_METHOD", "words")
+
+# How often (seconds) to re-read the CURRENT version pointer.
+RELOAD_CHECK_INTERVAL = float(os.getenv("RELOAD_CHECK_INTERVAL", "5"))
+
+
+@dataclass(frozen=True)
+class RetrievalSnapshot:
+    """Read-only view of one vector store version, memory-mapped from disk."""
+    chunks: vector_store.ChunkStore
+    index: object
+    manifest: dict
+    signature: str
+    embeddings: object = None
+    tags: dict = None
+    lexical: object = None
+
+    def tagged(self, key: str, value: str) -> list[int]:
+        """Chunk ids tagged key=value (e.g. "sign", "Aries"); empty if none."""
+        return (self.tags or {}).get(f"{key}:{value}", [])
+
+
+_snapshot: RetrievalSnapshot | None = None
+_last_check = 0.0
+_lock = threading.Lock()
+
+
+def build_index() -> str:
+    """Extract, embed and index the documents, writing a new store version."""
+    return ingest(find_documents(DOCUMENT_PATHS), max_len=CHUNK_MAX_LEN, overlap=CHUNK_OVERLAP,
+                  method=CHUNK_METHOD)["version"]
+
+
+def migrate_pickle_store(emb_file: str, index_file: str) -> str:
+    """
+    Convert a legacy (embeddings, chunks) pickle plus FAISS index into a store version.
+
+    Only run this on files you produced yourself: unpickling executes code.
+    """
+    import pickle
+    import faiss
+
+    with open(emb_file, "rb") as f:
+        embeddings, chunks = pickle.load(f)
+    index = faiss.read_index(index_file)
+    return vector_store.write_version(embeddings, chunks, index, {
+        "sources": [{"path": PDF_PATH, "sha256": vector_store.file_sha256(PDF_PATH)}],
+        "chunking": {"method": "words", "max_len": CHUNK_MAX_LEN, "overlap": 0},
+        "embedding_model": EMBED_MODEL,
+        "migrated_from": os.path.basename(emb_file),
+        "index": {"type": "flat_l2"},
+    })
+
+
+def _load(version: str) -> RetrievalSnapshot:
+    manifest = vector_store.read_manifest(version)
+    return RetrievalSnapshot(
+        chunks=vector_store.open_chunks(version),
+        index=apply_search_params(vector_store.open_index(version), manifest.get("index", {})),
+        manifest=manifest,
+        signature=version,
+        embeddings=vector_store.open_embeddings(version),
+        tags=vector_store.open_tags(version),
+        lexical=vector_store.open_lexical(version),
+    )
+
+
+def get_snapshot() -> RetrievalSnapshot:
+    """
+    Return the current retrieval snapshot, loading it on first use.
+
+    The CURRENT version pointer is re-checked at most every
+    RELOAD_CHECK_INTERVAL seconds and the snapshot is swapped in one
+    assignment, so callers holding the previous snapshot keep using it until
+    they finish.
+    """
+    global _snapshot, _last_check
+
+    snapshot = _snapshot
+    now = time.monotonic()
+    if snapshot is not None and now - _last_check < RELOAD_CHECK_INTERVAL:
+        return snapshot
+
+    with _lock:
+        if _snapshot is not None and now - _last_check < RELOAD_CHECK_INTERVAL:
+            return _snapshot
+
+        version = vector_store.current_version()
+        if version is None:
+            # First-time load
+            version = build_index()
+
+        if _snapshot is None or _snapshot.signature != version:
+            _snapshot = _load(version)
+        _last_check = now
+        return _snapshot
+
+
+def reload():
+    """Force the next get_snapshot() call to re-check the version on disk."""
+    global _last_check
+    with _lock:
+        _last_check = 0.0
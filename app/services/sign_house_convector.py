@@ -2,16 +2,15 @@ import swisseph as swe
 import pytz
 from datetime import datetime
 import os
+import numpy as np
 
-EPHE_PATH = "./app/ephe"
-print(">>> Using EPHE_PATH:", EPHE_PATH)
-print(">>> Files:", os.listdir(EPHE_PATH))
-swe.set_ephe_path(EPHE_PATH)
+from app.services import chiron_table, ephemeris
+from app.services.chiron_table import SIGNS
+from app.services.ephemeris import EPHE_PATH, get_house
 
-SIGNS = [
-    'Aries', 'Taurus', 'Gemini', 'Cancer', 'Leo', 'Virgo',
-    'Libra', 'Scorpio', 'Sagittarius', 'Capricorn', 'Aquarius', 'Pisces'
-]
+# "table": interpolate the precomputed Chiron table (falls back to swisseph
+# outside its range); "swisseph": call swe.calc_ut for every request.
+CHIRON_BACKEND = os.getenv("CHIRON_BACKEND", "table")
 
 def parse_timezone_offset(tz_str: str) -> int:
     """
@@ -21,59 +20,104 @@ def parse_timezone_offset(tz_str: str) -> int:
     hours, minutes = map(int, tz_str[1:].split(':'))
     return sign * (hours * 60 + minutes)
 
-def get_house(longitude: float, houses: list[float]) -> int:
-    """
-    Determine which house a given longitude belongs to.
-    Uses Placidus houses.
-    """
-    for i in range(11):  # houses 1–11
-        if houses[i] <= longitude < houses[i + 1]:
-            return i + 1
-    return 12  # wrap-around → house 12
+def ordinal(n: int) -> str:
+    if 10 <= n % 100 <= 20:  # handles 11th, 12th, 13th, etc.
+        suffix = "th"
+    else:
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
 
-def calculate_chiron_position(
-    birth_date: str,
-    birth_time: str,
-    timezone: str,
-    latitude: float,
-    longitude: float
-) -> dict:
-    """
-    Service method to calculate Chiron's zodiac sign and house placement.
-    Optimized for FastAPI usage (minimal memory, efficient calls).
-    """
+HOUSES = [ordinal(n) for n in range(1, 13)]
 
-    # Step 1: Convert local time → UTC
+def birth_julian_day(birth_date: str, birth_time: str, timezone: str) -> float:
+    """Julian Day (UT) for a local birth date/time and a +HH:MM offset."""
     local_tz_offset = parse_timezone_offset(timezone)
     local_tz = pytz.FixedOffset(local_tz_offset)
     dt = datetime.strptime(f"{birth_date} {birth_time}", "%Y-%m-%d %H:%M")
     dt_local = local_tz.localize(dt)
     dt_utc = dt_local.astimezone(pytz.utc)
 
-    # Step 2: Julian Day
-    jd_ut = swe.julday(
+    return swe.julday(
         dt_utc.year,
         dt_utc.month,
         dt_utc.day,
         dt_utc.hour + dt_utc.minute / 60.0
     )
-    swe.set_ephe_path(EPHE_PATH)
 
-    # Step 3: Chiron position
-    chiron_data, _ = swe.calc_ut(jd_ut, swe.CHIRON)
-    chiron_long = chiron_data[0]
+def _table_longitudes(jds: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Longitudes from the Chiron table and the mask of days it covered."""
+    longitudes = np.empty(len(jds))
+    from_table = np.zeros(len(jds), dtype=bool)
+    if CHIRON_BACKEND == "table" and chiron_table.available():
+        from_table = chiron_table.in_range(jds)
+        longitudes[from_table] = chiron_table.chiron_longitudes(jds[from_table])
+    return longitudes, from_table
+
+def chiron_longitudes(jds) -> np.ndarray:
+    """Chiron's longitude for an array of Julian days from the selected backend."""
+    jds = np.asarray(jds, dtype=np.float64)
+    longitudes, from_table = _table_longitudes(jds)
+    if not from_table.all():
+        # Outside the table range (or swisseph backend selected)
+        missing = np.flatnonzero(~from_table)
+        charts = [(float(jds[i]), None, None, None) for i in missing]
+        longitudes[missing] = [chiron_long for chiron_long, _ in ephemeris.compute(charts)]
+    return longitudes
+
+def _placements(jds: list[float], locations: list[tuple[float, float]]) -> list[dict]:
+    """
+    Chiron's sign and Placidus house for each Julian day and (lat, lon).
+
+    The table lookup is vectorized here; the house cusps, and calc_ut for
+    any day the table does not cover, are one batch on the ephemeris engine.
+    """
+    if not jds:
+        return []
+    known, from_table = _table_longitudes(np.asarray(jds, dtype=np.float64))
+    charts = [(jd_ut, lat, lon, float(chiron_long) if covered else None)
+              for jd_ut, (lat, lon), chiron_long, covered in zip(jds, locations, known, from_table)]
+    return [
+        {
+            "longitude": round(chiron_long, 2),
+            "zodiac_sign": SIGNS[int(chiron_long // 30)],
+            "house": house
+        }
+        for chiron_long, house in ephemeris.compute(charts)
+    ]
+
+def calculate_chiron_position(
+    birth_date: str,
+    birth_time: str,
+    timezone: str,
+    latitude: float,
+    longitude: float
+) -> dict:
+    """
+    Service method to calculate Chiron's zodiac sign and house placement.
+    Optimized for FastAPI usage (minimal memory, efficient calls).
+    """
+    jd_ut = birth_julian_day(birth_date, birth_time, timezone)
+    return _placements([jd_ut], [(latitude, longitude)])[0]
 
-    # Step 4: Zodiac sign
-    sign_index = int(chiron_long // 30)
-    zodiac_sign = SIGNS[sign_index]
+def calculate_chiron_positions(records: list[dict]) -> list:
+    """
+    Batch version of calculate_chiron_position.
 
-    # Step 5: House placement (Placidus)
-    houses, ascmc = swe.houses(jd_ut, latitude, longitude, b'P')
-    chiron_house = get_house(chiron_long, houses)
+    Each record holds the calculate_chiron_position keyword arguments. The
+    whole batch goes to the ephemeris engine in as few round trips as it has
+    workers; a record that fails to parse yields a ValueError in its slot
+    instead.
+    """
+    results = [None] * len(records)
+    valid, jds = [], []
+    for i, record in enumerate(records):
+        try:
+            jds.append(birth_julian_day(record["birth_date"], record["birth_time"], record["timezone"]))
+            valid.append(i)
+        except (ValueError, TypeError, IndexError) as e:
+            results[i] = ValueError(f"Invalid birth date/time or timezone: {e}")
 
-    # Step 6: Return structured result
-    return {
-        "longitude": round(chiron_long, 2),
-        "zodiac_sign": zodiac_sign,
-        "house": chiron_house
-    }
+    locations = [(records[i]["latitude"], records[i]["longitude"]) for i in valid]
+    for i, placement in zip(valid, _placements(jds, locations)):
+        results[i] = placement
+    return results
@@ -0,0 +1,103 @@
+"""
+Schema-driven response formats and parse/repair accounting for LLM JSON.
+
+LLM_RESPONSE_FORMAT selects how the schema is enforced:
+  json_schema  strict structured outputs generated from the Pydantic model
+               (needs a model that supports them, e.g. gpt-4o-mini)
+  json_object  JSON mode: always a single JSON object, schema given in the prompt
+  none         no response_format; rely on the prompt and local repair
+"""
+import os
+from collections import Counter
+
+from pydantic import BaseModel, TypeAdapter, ValidationError, create_model
+
+LLM_RESPONSE_FORMAT = os.getenv("LLM_RESPONSE_FORMAT", "json_object")
+# Ask the model once for fields (or plan days) missing from a partly valid answer.
+LLM_FOLLOWUP = os.getenv("LLM_FOLLOWUP", "1") == "1"
+
+counters = Counter()
+
+
+def _strict(node):
+    """Structured outputs require every property listed and no extras."""
+    if isinstance(node, dict):
+        if node.get("type") == "object" and "properties" in node:
+            node["required"] = list(node["properties"])
+            node["additionalProperties"] = False
+        node.pop("title", None)
+        for value in node.values():
+            _strict(value)
+    elif isinstance(node, list):
+        for value in node:
+            _strict(value)
+    return node
+
+
+def strict_schema(model: type[BaseModel]) -> dict:
+    return _strict(model.model_json_schema())
+
+
+def response_format(model: type[BaseModel] | None) -> dict | None:
+    """The response_format argument for a completion producing model."""
+    if model is None or LLM_RESPONSE_FORMAT == "none":
+        return None
+    if LLM_RESPONSE_FORMAT == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": model.__name__, "schema": strict_schema(model), "strict": True},
+        }
+    return {"type": "json_object"}
+
+
+def subset_model(model: type[BaseModel], fields: list[str]) -> type[BaseModel]:
+    """A model with only the given fields of model, all required."""
+    return create_model(
+        model.__name__ + "Missing",
+        **{name: (model.model_fields[name].annotation, ...) for name in fields},
+    )
+
+
+def split_valid(data: dict, model: type[BaseModel]) -> tuple[dict, list[str]]:
+    """Fields of data that validate against model, and the names of those that are missing or invalid."""
+    valid, missing = {}, []
+    for name, field in model.model_fields.items():
+        if name not in data:
+            missing.append(name)
+            continue
+        try:
+            valid[name] = TypeAdapter(field.annotation).validate_python(data[name])
+        except ValidationError:
+            missing.append(name)
+    return valid, missing
+
+
+def valid_items(items: list, model: type[BaseModel]) -> list[dict]:
+    """Items that validate against model (as plain dicts); the rest are dropped."""
+    valid = []
+    for item in items:
+        try:
+            valid.append(model.model_validate(item).model_dump())
+        except ValidationError:
+            continue
+    return valid
+
+
+def record(value, repairs: list[str]):
+    """Count one parsed response and the repairs it needed."""
+    counters["responses"] += 1
+    if value is None:
+        counters["parse_failures"] += 1
+    elif repairs:
+        counters["repaired"] += 1
+    for repair in repairs:
+        counters["repair_" + repair] += 1
+
+
+def stats() -> dict:
+    responses = counters["responses"]
+    return dict(
+        counters,
+        parse_failure_rate=counters["parse_failures"] / responses if responses else 0.0,
+        repair_rate=counters["repaired"] / responses if responses else 0.0,
+    )
@@ -0,0 +1,171 @@
+"""
+Field-wise translation of generated overviews and plans.
+
+Content is generated once per placement in CANONICAL_LANGUAGE. Other
+languages are produced from that validated JSON by a translation pass: the
+payload's string values are sent as one flat {"t0": text, ...} object and
+written back into the same structure, so keys, list lengths and any field
+listed in `keep` never change.
+
+Translations are stored in a SQLite table keyed by (sha256 of the canonical
+payload, language, TRANSLATION_VERSION). Adding a language therefore costs
+one translation call per placement and never a regeneration.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from pydantic import create_model
+
+from app.services import structured_output
+from app.services.executor import run_blocking
+from app.services.llm_service import LLM_MODEL, query_llm_json
+
+CANONICAL_LANGUAGE = os.getenv("CANONICAL_LANGUAGE", "English")
+TRANSLATION_MODEL = os.getenv("TRANSLATION_MODEL", LLM_MODEL)
+TRANSLATION_CACHE_FILE = os.getenv("TRANSLATION_CACHE_FILE", "app/vector_db/translations.sqlite")
+
+# Bump when the instructions change meaning; cached translations are keyed by it.
+TRANSLATION_VERSION = "translate-v1"
+
+TRANSLATE_INSTRUCTIONS = """
+You are a professional translator of reflective, spiritual self-help writing.
+Translate every value of the JSON object given at the end into the target language.
+
+Rules:
+- Keep every key exactly as it is and return a value for each key.
+- Preserve the meaning, warmth and tone; keep each value about as long as the original.
+- Keep astrological terms (Chiron, sign and house names) as they are commonly written in the target language.
+- Do not add, merge or drop values, and do not add explanations.
+
+Output must be a **valid JSON object** with the same keys.
+"""
+
+TRANSLATE_REQUEST = """
+Target language: {language}
+
+JSON:
+{payload}
+"""
+
+
+def is_canonical(language: str | None) -> bool:
+    return not language or language.strip().lower() in (CANONICAL_LANGUAGE.lower(), "en")
+
+
+def canonical_language(language: str | None) -> str:
+    """The one spelling of language used as a storage key ("en" -> CANONICAL_LANGUAGE, "french" -> "French")."""
+    return CANONICAL_LANGUAGE if is_canonical(language) else language.strip().title()
+
+
+def canonical_hash(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+_local = threading.local()
+
+
+def _conn():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(TRANSLATION_CACHE_FILE, timeout=10)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "canonical TEXT, language TEXT, version TEXT, payload TEXT, created_at REAL, "
+            "PRIMARY KEY (canonical, language, version))"
+        )
+        _local.conn = conn
+    return conn
+
+
+def get(digest: str, language: str):
+    row = _conn().execute(
+        "SELECT payload FROM translations WHERE canonical = ? AND language = ? AND version = ?",
+        (digest, language.strip().lower(), TRANSLATION_VERSION),
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def put(digest: str, language: str, payload):
+    conn = _conn()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)",
+            (digest, language.strip().lower(), TRANSLATION_VERSION, json.dumps(payload, ensure_ascii=False),
+             time.time()),
+        )
+
+
+def _strings(value, keep: tuple, out: list) -> list:
+    """Translatable string leaves of value in document order."""
+    if isinstance(value, str):
+        if value.strip():
+            out.append(value)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if key not in keep:
+                _strings(item, keep, out)
+    elif isinstance(value, list):
+        for item in value:
+            _strings(item, keep, out)
+    return out
+
+
+def _replace(value, keep: tuple, translated: dict):
+    """value with every translatable string swapped for its translation."""
+    if isinstance(value, str):
+        return translated.get(value, value)
+    if isinstance(value, dict):
+        return {key: item if key in keep else _replace(item, keep, translated) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_replace(item, keep, translated) for item in value]
+    return value
+
+
+async def _translate_strings(texts: list[str], language: str) -> dict:
+    """{text: translation} for the texts the model translated validly."""
+    ids = {f"t{i}": text for i, text in enumerate(texts)}
+    schema = create_model("Translation", **{key: (str, ...) for key in ids})
+    prompt = TRANSLATE_INSTRUCTIONS + TRANSLATE_REQUEST.format(
+        language=language, payload=json.dumps(ids, ensure_ascii=False, indent=0))
+    data = await query_llm_json(prompt, temperature=0.0, prompt_version=TRANSLATION_VERSION,
+                                schema=schema, model=TRANSLATION_MODEL)
+    if not data:
+        return {}
+    valid, _ = structured_output.split_valid(data, schema)
+    return {ids[key]: text for key, text in valid.items() if text.strip()}
+
+
+async def translate(payload, language: str, keep: tuple = ()):
+    """
+    payload (canonical JSON) in `language`; fields named in keep stay as they are.
+
+    Returns payload itself for the canonical language and None if nothing
+    could be translated. Strings the model skipped are requested once more
+    on their own; any still missing stay in the canonical language, and such
+    a partial result is not cached.
+    """
+    if is_canonical(language):
+        return payload
+    digest = canonical_hash(payload)
+    cached = await run_blocking(get, digest, language)
+    if cached is not None:
+        return cached
+
+    texts = list(dict.fromkeys(_strings(payload, keep, [])))
+    translated = await _translate_strings(texts, language)
+    missing = [text for text in texts if text not in translated]
+    if missing and translated:
+        structured_output.counters["followups"] += 1
+        translated.update(await _translate_strings(missing, language))
+        missing = [text for text in texts if text not in translated]
+    if not translated and texts:
+        return None
+
+    result = _replace(payload, keep, translated)
+    if not missing:
+        await run_blocking(put, digest, language, result)
+    return result
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import faiss
+import numpy as np
+
+from app.services import lexical_index
+
+# Layout:
+#   <VECTOR_STORE_DIR>/CURRENT            name of the live version directory
+#   <VECTOR_STORE_DIR>/<version>/
+#       manifest.json                     source hashes, chunking, model, dim, count
+#       embeddings.npy                    float32 (count, dim), opened with mmap
+#       chunks.bin                        all chunk texts, UTF-8, concatenated
+#       chunk_offsets.npy                 int64 (count + 1) byte offsets into chunks.bin
+#       chunk_meta.npy                    (document, page, offset) per chunk; document
+#                                         indexes manifest["documents"], -1 if unknown
+#       lexical_*                         BM25 inverted index (see lexical_index)
+#       tags.json                         {"sign:Aries": [chunk ids], "house:7th": [...]}
+#       faiss.index                       read with the mmap I/O flag
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "app/vector_db")
+CURRENT_FILE = os.path.join(VECTOR_STORE_DIR, "CURRENT")
+
+FORMAT_VERSION = 1
+CHUNK_META_DTYPE = np.dtype([("document", np.int32), ("page", np.int32), ("offset", np.int64)])
+# Rows copied per step when converting the raw embeddings file to .npy.
+COPY_BLOCK_ROWS = 65536
+INDEX_IO_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+class ChunkStore:
+    """Read-only list of chunk texts decoded on access from a memory-mapped blob."""
+
+    def __init__(self, blob_path: str, offsets_path: str):
+        self.offsets = np.load(offsets_path, mmap_mode="r")
+        # np.memmap cannot map an empty file
+        if os.path.getsize(blob_path):
+            self.blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            self.blob = np.empty(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        i = i % len(self)
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def current_version() -> str | None:
+    try:
+        with open(CURRENT_FILE) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_dir(version: str) -> str:
+    return os.path.join(VECTOR_STORE_DIR, version)
+
+
+class VersionWriter:
+    """
+    Stream a store version to disk batch by batch, then publish it atomically.
+
+    Chunk texts, embeddings and chunk metadata are appended to files in a
+    temporary directory as batches arrive, so only the current batch is held
+    in memory. If an index is given, each batch is also added to it. commit()
+    finalizes the files, renames the directory into place and replaces
+    CURRENT; abort() discards everything written so far.
+    """
+
+    def __init__(self, manifest: dict, index=None):
+        self.manifest = manifest
+        self.index = index
+        self.tmp_dir = os.path.join(VECTOR_STORE_DIR, f"building-{os.getpid()}-{time.time_ns()}.tmp")
+        os.makedirs(self.tmp_dir)
+        self.digest = hashlib.sha256()
+        self.documents = {}
+        self.tags = {}
+        self.lexical = lexical_index.LexicalIndexBuilder()
+        self.offsets = [0]
+        self.dim = 0
+        self._embeddings = open(self._path("embeddings.f32"), "wb")
+        self._chunks = open(self._path("chunks.bin"), "wb")
+        self._meta = open(self._path("chunk_meta.bin"), "wb")
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.tmp_dir, name)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def add(self, chunks: list[str], embeddings: np.ndarray, meta: list[tuple] = None,
+            tags: list[dict] = None):
+        """
+        Append chunks with their embeddings, optional (document, page, offset)
+        rows and optional per-chunk tag dicts such as {"sign": "Aries"}.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if len(chunks) != len(embeddings):
+            raise ValueError("chunks and embeddings differ in length")
+        if not len(chunks):
+            return
+        if self.dim and embeddings.shape[1] != self.dim:
+            raise ValueError(f"embedding dim {embeddings.shape[1]} != {self.dim}")
+        self.dim = embeddings.shape[1]
+
+        if tags is not None:
+            first = len(self)
+            for i, chunk_tags in enumerate(tags):
+                for key, value in chunk_tags.items():
+                    if value is not None:
+                        self.tags.setdefault(f"{key}:{value}", []).append(first + i)
+
+        for chunk in chunks:
+            self.lexical.add(chunk)
+        encoded = [chunk.encode("utf-8") for chunk in chunks]
+        for b in encoded:
+            self.offsets.append(self.offsets[-1] + len(b))
+        rows = np.full(len(chunks), -1, dtype=CHUNK_META_DTYPE)
+        if meta is not None:
+            for row, (document, page, offset) in zip(rows, meta):
+                row["document"] = self.documents.setdefault(document, len(self.documents))
+                row["page"], row["offset"] = page, offset
+
+        blob = b"".join(encoded)
+        self._embeddings.write(embeddings.tobytes())
+        self._chunks.write(blob)
+        self._meta.write(rows.tobytes())
+        self.digest.update(embeddings.tobytes())
+        self.digest.update(blob)
+        if self.index is not None:
+            self.index.add(embeddings)
+
+    def commit(self, index=None, index_builder=None) -> str:
+        """
+        Write the remaining files and make this version current. Returns its name.
+
+        index_builder, if given, is called with the finished (memory-mapped)
+        embeddings and returns (index, index_meta); the meta is stored in the
+        manifest under "index". Otherwise index, or the one filled by add(), is used.
+        """
+        index = index if index is not None else self.index
+        if index is None and index_builder is None:
+            raise ValueError("no FAISS index to write")
+        for f in (self._embeddings, self._chunks, self._meta):
+            f.close()
+        count = len(self)
+
+        raw = self._path("embeddings.f32")
+        out = np.lib.format.open_memmap(self._path("embeddings.npy"), mode="w+",
+                                        dtype=np.float32, shape=(count, self.dim))
+        if count and self.dim:
+            src = np.memmap(raw, dtype=np.float32, mode="r", shape=(count, self.dim))
+            for start in range(0, count, COPY_BLOCK_ROWS):
+                out[start:start + COPY_BLOCK_ROWS] = src[start:start + COPY_BLOCK_ROWS]
+            del src
+        out.flush()
+        del out
+        os.remove(raw)
+
+        index_meta = None
+        if index_builder is not None:
+            index, index_meta = index_builder(np.load(self._path("embeddings.npy"), mmap_mode="r"))
+
+        meta_raw = self._path("chunk_meta.bin")
+        with open(meta_raw, "rb") as f:
+            np.save(self._path("chunk_meta.npy"), np.frombuffer(f.read(), dtype=CHUNK_META_DTYPE))
+        os.remove(meta_raw)
+        np.save(self._path("chunk_offsets.npy"), np.array(self.offsets, dtype=np.int64))
+        with open(self._path("tags.json"), "w") as f:
+            json.dump(self.tags, f)
+        lexical_meta = self.lexical.save(self.tmp_dir)
+        faiss.write_index(index, self._path("faiss.index"))
+
+        version = time.strftime("v%Y%m%d%H%M%S") + "-" + self.digest.hexdigest()[:8]
+        manifest = dict(
+            self.manifest,
+            format_version=FORMAT_VERSION,
+            version=version,
+            count=count,
+            dim=int(self.dim),
+            created_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            lexical=lexical_meta,
+        )
+        if self.documents:
+            manifest["documents"] = list(self.documents)
+        if index_meta is not None:
+            manifest["index"] = index_meta
+        with open(self._path("manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        os.replace(self.tmp_dir, version_dir(version))
+        tmp_current = CURRENT_FILE + ".tmp"
+        with open(tmp_current, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp_current, CURRENT_FILE)
+        return version
+
+    def abort(self):
+        for f in (self._embeddings, self._chunks, self._meta):
+            f.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def write_version(embeddings: np.ndarray, chunks: list[str], index, manifest: dict,
+                  meta: list[tuple] = None) -> str:
+    """
+    Write a complete store version from in-memory arrays and make it current.
+
+    Files go to a temporary directory that is renamed into place, then
+    CURRENT is replaced, so readers only ever see whole versions.
+    """
+    writer = VersionWriter(manifest)
+    try:
+        writer.add(chunks, embeddings, meta)
+        return writer.commit(index)
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def read_manifest(version: str) -> dict:
+    with open(os.path.join(version_dir(version), "manifest.json")) as f:
+        return json.load(f)
+
+
+def open_embeddings(version: str) -> np.ndarray:
+    return np.load(os.path.join(version_dir(version), "embeddings.npy"), mmap_mode="r")
+
+
+def open_chunks(version: str) -> ChunkStore:
+    path = version_dir(version)
+    return ChunkStore(os.path.join(path, "chunks.bin"), os.path.join(path, "chunk_offsets.npy"))
+
+
+def open_chunk_meta(version: str) -> np.ndarray | None:
+    """Per-chunk (document, page, offset) rows, or None for versions written without them."""
+    path = os.path.join(version_dir(version), "chunk_meta.npy")
+    return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+
+def open_tags(version: str) -> dict:
+    """Tag -> chunk ids, e.g. {"sign:Aries": [3, 17]}; empty for untagged versions."""
+    path = os.path.join(version_dir(version), "tags.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def open_lexical(version: str) -> lexical_index.LexicalIndex | None:
+    return lexical_index.open_index(version_dir(version))
+
+
+def open_index(version: str):
+    return faiss.read_index(os.path.join(version_dir(version), "faiss.index"), INDEX_IO_FLAGS)
@@ -0,0 +1,84 @@
+import gc
+import importlib
+import time
+
+# Modules imported in dependency order. Each import is timed on its own, so a
+# third-party package is charged to the first module that pulls it in.
+COMPONENT_MODULES = [
+    "numpy",
+    "faiss",
+    "openai",
+    "fitz",
+    "swisseph",
+    "rapidfuzz",
+    "geopy",
+    "geonamescache",
+    "timezonefinder",
+    "pytz",
+    "fastapi",
+    "app.services.lazy",
+    "app.services.place_index",
+    "app.services.gazetteer",
+    "app.services.ephemeris",
+    "app.services.chiron_table",
+    "app.services.sign_house_convector",
+    "app.services.location_convector",
+    "app.services.embedding_service",
+    "app.services.retrieval_store",
+    "app.services.llm_service",
+    "app.services.healing_service",
+    "app.services.overview_service",
+    "app.controllers.plan_controller",
+    "app.main",
+]
+
+
+def import_timings() -> list[tuple[str, float]]:
+    """(module, seconds) for importing each component not already imported."""
+    timings = []
+    for name in COMPONENT_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        timings.append((name, time.perf_counter() - start))
+    return timings
+
+
+def warm_up() -> list[tuple[str, float]]:
+    """
+    Build every heavy, fork-safe object up front.
+
+    Run it in the gunicorn master with preload_app so workers inherit the
+    pages copy-on-write instead of each building its own copy. OpenAI
+    clients and SQLite connections are left to each worker.
+    """
+    from app.services import location_convector, retrieval_store, sign_house_convector  # noqa: F401
+    from app.services.lazy import Lazy
+
+    timings = []
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        fn()
+        timings.append((name, time.perf_counter() - start))
+
+    for lazy in Lazy.registry:
+        if lazy.preload:
+            timed(lazy.name, lazy.get)
+    timed("city matchers", location_convector.warm_city_matchers)
+    timed("retrieval store", retrieval_store.get_snapshot)
+    return timings
+
+
+def preload():
+    """warm_up() then freeze the heap so refcount updates don't un-share pages."""
+    timings = warm_up()
+    gc.collect()
+    gc.freeze()
+    return timings
+
+
+def format_report(title: str, timings: list[tuple[str, float]]) -> str:
+    lines = [title]
+    lines += [f"  {seconds * 1000:9.1f} ms  {name}" for name, seconds in timings]
+    lines.append(f"  {sum(s for _, s in timings) * 1000:9.1f} ms  total")
+    return "\n".join(lines)
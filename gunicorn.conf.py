@@ -0,0 +1,11 @@
+# Loaded automatically by gunicorn from the working directory.
+from app.startup import preload, format_report
+
+worker_class = "uvicorn.workers.UvicornWorker"
+# Import the app once in the master so workers share its memory.
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before workers fork.
+    server.log.info(format_report("Startup warm-up:", preload()))